@@ -1,160 +1,658 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from typing import List
-import shutil
+from sqlalchemy import select, update, delete, func, tuple_, literal
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from typing import List, Optional, Tuple
+import aiofiles.os
+import asyncio
+import base64
+import json
 import os
-import uuid
+import time
 
-from app.db.session import get_db
-from app.models.models import User, Session, Document, Message
-from app.schemas import ChatRequest, ChatResponse, SessionResponse, MessageResponse, DocumentResponse
+from app.config import settings
+from app.db.session import get_db, AsyncSessionLocal, engine, insert_ignore
+from app.models.models import User, Session, Document, DocumentPage, Message
+from app.schemas import (
+    ChatRequest, ChatResponse, BatchChatRequest, SessionResponse, DocumentStatusResponse, IndexingJobResponse,
+    DocumentListResponse, SessionListResponse, MessageListResponse,
+    BulkUploadItem, BulkProgressResponse, BulkUploadResponse
+)
+from app.services.answer_cache import answer_cache
+from app.services.embedding_cache import embedding_cache
 from app.services.indexing_service import indexing_service
+from app.services.ingest_service import ingest_service, IngestBatch
+from app.services.job_service import indexing_job_queue
+from app.services.metrics_writer import metrics_writer
+from app.services.retrieval_service import retrieval_service
+from app.services.storage import (
+    UPLOAD_DIR, PDF_MAGIC, ZIP_MAGIC, SavedUpload, UploadTooLarge, InvalidUpload, UnsupportedFileType,
+    discard_uploads, extract_zip_pdfs, receive_uploads, stored_filename, stored_path
+)
+from app.services.telemetry import telemetry
 
 from app.services.llm_service import llm_service
 
 router = APIRouter()
-UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# --- Pagination ---
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _encode_cursor(sort_value: datetime, row_id: int) -> str:
+    raw = json.dumps([sort_value.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _timestamp_bound(value: datetime):
+    # SQLite keeps timestamps as text; server defaults have no fractional
+    # seconds, so compare against the same text form rather than a bound datetime
+    if engine.dialect.name == "sqlite":
+        fmt = "%Y-%m-%d %H:%M:%S.%f" if value.microsecond else "%Y-%m-%d %H:%M:%S"
+        return literal(value.strftime(fmt))
+    return value
+
+
+async def _keyset_page(db: AsyncSession, query, sort_column, id_column, cursor: Optional[str], limit: int):
+    """
+    Fetch one page of `query` in descending (sort_column, id) order.
+    
+    Seeks past the cursor's (sort value, id) instead of using OFFSET, so
+    every page is an index range scan no matter how deep it is. Returns
+    (rows as mappings, next_cursor or None on the last page).
+    """
+    if cursor:
+        sort_value, row_id = _decode_cursor(cursor)
+        query = query.where(tuple_(sort_column, id_column) < tuple_(_timestamp_bound(sort_value), row_id))
+    query = query.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).mappings().all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1][sort_column.key], rows[-1][id_column.key])
+    return rows, next_cursor
+
 # --- Document Management ---
 
-@router.post("/upload", response_model=DocumentResponse)
+# The body is parsed by hand (see receive_uploads), so describe it for the docs
+PDF_UPLOAD_BODY = {
+    "requestBody": {
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"file": {"type": "string", "format": "binary"}},
+        }}},
+    }
+}
+
+
+async def _receive_pdf(request: Request, required: bool = True) -> Optional[SavedUpload]:
+    """Stream the request's single PDF to a temporary file, mapping rejections to HTTP errors."""
+    try:
+        uploads = await receive_uploads(request)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedFileType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(uploads) > 1 or (required and not uploads):
+        await discard_uploads(uploads)
+        raise HTTPException(status_code=400, detail="Expected exactly one file")
+    return uploads[0] if uploads else None
+
+
+def _document_status(doc: Document, duplicate: bool = False) -> DocumentStatusResponse:
+    response = DocumentStatusResponse.model_validate(doc)
+    response.duplicate = duplicate
+    job = indexing_job_queue.get_job_for_document(doc.id)
+    if job:
+        response.job = IndexingJobResponse.model_validate(job)
+    return response
+
+
+@router.post(
+    "/upload", response_model=DocumentStatusResponse, status_code=202, openapi_extra=PDF_UPLOAD_BODY
+)
 async def upload_document(
-    file: UploadFile = File(...),
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db)
 ):
-    """Upload and index a PDF document."""
-    file_id = str(uuid.uuid4())
-    file_ext = os.path.splitext(file.filename)[1]
-    saved_filename = f"{file_id}{file_ext}"
-    file_path = os.path.join(UPLOAD_DIR, saved_filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    """
+    Upload a PDF document (multipart field "file") and queue it for background indexing.
+    
+    The body is streamed to disk and hashed as it arrives. Uploads over
+    `max_upload_mb` are rejected with 413 (from Content-Length when it is
+    sent, otherwise as soon as the limit is crossed) and files that do not
+    start with the PDF magic bytes with 415.
+    
+    Files are identified by SHA-256 of their content. Re-uploading an indexed
+    file returns the existing document (200) without any work, and
+    re-uploading a file that is still indexing attaches to the running job.
+    """
+    upload = await _receive_pdf(request)
+    doc, duplicate = await ingest_service.register(db, upload)
+    if duplicate:
+        if doc.status == "indexed":
+            response.status_code = 200
+        return _document_status(doc, duplicate=True)
+    
+    try:
+        indexing_job_queue.submit(doc.id, stored_path(doc.filename, doc.file_hash))
+    except asyncio.QueueFull:
+        doc.status = "error"
+        await db.commit()
+        raise HTTPException(status_code=503, detail="Indexing queue is full, please retry later")
         
-    new_doc = Document(
-        filename=file.filename,
-        file_hash=file_id, 
-        status="indexing"
+    return _document_status(doc)
+
+BULK_UPLOAD_BODY = {
+    "requestBody": {
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+        }}},
+    }
+}
+
+
+def _bulk_response(batch: IngestBatch) -> BulkUploadResponse:
+    return BulkUploadResponse(
+        batch_id=batch.id,
+        status=batch.status,
+        items=[BulkUploadItem.model_validate(item) for item in batch.items],
+        progress=BulkProgressResponse.model_validate(batch.progress())
+    )
+
+
+@router.post(
+    "/upload/bulk", response_model=BulkUploadResponse, status_code=202, openapi_extra=BULK_UPLOAD_BODY
+)
+async def upload_bulk(request: Request):
+    """
+    Upload many PDFs and/or ZIP archives of PDFs at once and queue them all for indexing.
+    
+    Every file part is streamed to disk like a single upload. ZIP archives
+    are unpacked member by member in a worker thread. Files that are not
+    PDFs, are over `max_upload_mb` or come after the first
+    `bulk_max_files` PDFs are skipped and reported per item rather than
+    failing the whole request; only a request over `max_bulk_upload_mb` is
+    refused (413). Duplicates (by content hash) are not indexed again.
+    
+    Returns a batch id; poll GET /upload/bulk/{batch_id} for aggregate progress.
+    """
+    max_file_bytes = settings.max_upload_mb * 1024 * 1024
+    max_request_bytes = settings.max_bulk_upload_mb * 1024 * 1024
+    rejected: List[Tuple[str, str]] = []
+    try:
+        # Archives may be as large as the whole request; PDFs are checked below
+        parts = await receive_uploads(
+            request,
+            max_file_bytes=max_request_bytes,
+            max_request_bytes=max_request_bytes,
+            magic=(PDF_MAGIC, ZIP_MAGIC),
+            rejected=rejected
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    uploads: List[SavedUpload] = []
+    try:
+        for part in parts:
+            if part.magic == ZIP_MAGIC:
+                remaining = settings.bulk_max_files - len(uploads)
+                uploads.extend(await asyncio.to_thread(
+                    extract_zip_pdfs, part.temp_path, part.filename,
+                    max_file_bytes, max_request_bytes, remaining, rejected
+                ))
+                await aiofiles.os.remove(part.temp_path)
+            elif part.size > max_file_bytes:
+                rejected.append((part.filename, f"{part.filename} is larger than {settings.max_upload_mb} MB"))
+                await aiofiles.os.remove(part.temp_path)
+            elif len(uploads) >= settings.bulk_max_files:
+                rejected.append((part.filename, f"More than {settings.bulk_max_files} files in one upload"))
+                await aiofiles.os.remove(part.temp_path)
+            else:
+                uploads.append(part)
+    except BaseException:
+        await discard_uploads(parts + uploads)
+        raise
+    if not uploads and not rejected:
+        raise HTTPException(status_code=400, detail="No files in the upload")
+    
+    return _bulk_response(await ingest_service.ingest(uploads, rejected))
+
+@router.get("/upload/bulk/{batch_id}", response_model=BulkUploadResponse)
+async def get_bulk_upload(batch_id: str):
+    """Aggregate indexing progress of a bulk upload."""
+    batch = ingest_service.get_batch(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return _bulk_response(batch)
+
+@router.get("/documents", response_model=DocumentListResponse)
+async def list_documents(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    """List uploaded documents, newest first, one page at a time."""
+    query = select(
+        Document.id, Document.filename, Document.file_hash, Document.status, Document.created_at
+    )
+    rows, next_cursor = await _keyset_page(db, query, Document.created_at, Document.id, cursor, limit)
+    return {"items": rows, "next_cursor": next_cursor}
+
+@router.get("/documents/{document_id}", response_model=DocumentStatusResponse)
+async def get_document(document_id: int, db: AsyncSession = Depends(get_db)):
+    """Get a document with the progress of its indexing job, if one is known."""
+    doc = await db.get(Document, document_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return _document_status(doc)
+
+async def _claim_document(db: AsyncSession, document_id: int, status: str, busy_detail: str) -> str:
+    """
+    Atomically move a document into `status` ("indexing" or "deleting") and return its previous status.
+    
+    The update only applies if the status is still the one just read, so
+    two concurrent reindex/delete requests cannot both claim the document.
+    A document being indexed (or, for a reindex, deleted) is refused with 409.
+    """
+    previous = await db.scalar(select(Document.status).where(Document.id == document_id))
+    if previous is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    busy = ("indexing",) if status == "deleting" else ("indexing", "deleting")
+    if previous in busy:
+        raise HTTPException(status_code=409, detail=busy_detail)
+    result = await db.execute(
+        update(Document)
+        .where(Document.id == document_id, Document.status == previous)
+        .values(status=status)
     )
-    db.add(new_doc)
     await db.commit()
-    await db.refresh(new_doc)
+    if result.rowcount != 1:
+        raise HTTPException(status_code=409, detail=busy_detail)
+    return previous
+
+
+async def _release_document(document_id: int, claimed: str, previous: str):
+    """Undo a claim after a failed request (in a fresh session: the request's may be unusable)."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Document)
+            .where(Document.id == document_id, Document.status == claimed)
+            .values(status=previous)
+        )
+        await db.commit()
+
+
+@router.post(
+    "/documents/{document_id}/reindex",
+    response_model=DocumentStatusResponse,
+    status_code=202,
+    openapi_extra=PDF_UPLOAD_BODY
+)
+async def reindex_document(
+    document_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Re-index a document, optionally from a revised PDF.
+    
+    Only pages whose content changed since the last run are embedded and
+    upserted again; chunks the new version no longer has are deleted.
+    Without a file the stored PDF is re-indexed, which only does work if
+    the chunking or embedding settings changed.
+    """
+    # Claimed before the body is read, so a concurrent reindex or delete gets 409
+    previous = await _claim_document(db, document_id, "indexing", "Document is already being indexed")
+    try:
+        doc = await db.get(Document, document_id, populate_existing=True)
+        old_path = stored_path(doc.filename, doc.file_hash)
+        upload = None
+        if request.headers.get("content-type", "").startswith("multipart/"):
+            upload = await _receive_pdf(request, required=False)
+        if upload is not None:
+            if upload.file_hash != doc.file_hash:
+                result = await db.execute(select(Document.id).where(Document.file_hash == upload.file_hash))
+                existing_id = result.scalar_one_or_none()
+                if existing_id is not None:
+                    await aiofiles.os.remove(upload.temp_path)
+                    raise HTTPException(
+                        status_code=409, detail=f"This file is already uploaded as document {existing_id}"
+                    )
+                doc.filename = upload.filename
+                doc.file_hash = upload.file_hash
+            await aiofiles.os.replace(upload.temp_path, stored_path(doc.filename, doc.file_hash))
+        elif not os.path.exists(old_path):
+            raise HTTPException(status_code=409, detail="Stored file is missing, upload it again")
+    
+        file_path = stored_path(doc.filename, doc.file_hash)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # A concurrent upload claimed the same content hash
+            await db.rollback()
+            if file_path != old_path:
+                await aiofiles.os.remove(file_path)
+            raise HTTPException(status_code=409, detail="This file was just uploaded as another document")
+        await db.refresh(doc)
+    except BaseException:
+        await _release_document(document_id, "indexing", previous)
+        raise
+    
+    if old_path != file_path and os.path.exists(old_path):
+        await aiofiles.os.remove(old_path)
     
     try:
-        await indexing_service.index_file(file_path)
-        new_doc.status = "indexed"
+        indexing_job_queue.submit(doc.id, file_path)
+    except asyncio.QueueFull:
+        doc.status = "error"
         await db.commit()
-    except Exception as e:
-        new_doc.status = "error"
+        raise HTTPException(status_code=503, detail="Indexing queue is full, please retry later")
+    return _document_status(doc)
+
+@router.delete("/documents/{document_id}", status_code=204)
+async def delete_document(document_id: int, db: AsyncSession = Depends(get_db)):
+    """Delete a document: its vectors in Qdrant, its page hashes, its row and the stored PDF."""
+    previous = await _claim_document(
+        db, document_id, "deleting", "Document is being indexed, retry once it finishes"
+    )
+    try:
+        doc = await db.get(Document, document_id, populate_existing=True)
+        file_path = stored_path(doc.filename, doc.file_hash)
+        await indexing_service.delete_document(doc.id, source=stored_filename(doc.filename, doc.file_hash))
+        await db.execute(delete(DocumentPage).where(DocumentPage.document_id == doc.id))
+        await db.delete(doc)
         await db.commit()
-        raise HTTPException(status_code=500, detail=f"Indexing failed: {str(e)}")
-        
-    return new_doc
+    except BaseException:
+        await _release_document(document_id, "deleting", previous)
+        raise
+    if os.path.exists(file_path):
+        await aiofiles.os.remove(file_path)
+    # Cached answers may cite the deleted document
+    answer_cache.bump_corpus_version()
+    return Response(status_code=204)
 
-@router.get("/documents", response_model=List[DocumentResponse])
-async def list_documents(db: AsyncSession = Depends(get_db)):
-    """List all uploaded documents."""
-    result = await db.execute(select(Document).order_by(desc(Document.created_at)))
-    return result.scalars().all()
+@router.get("/jobs/{job_id}", response_model=IndexingJobResponse)
+async def get_indexing_job(job_id: str):
+    """Get the status and progress of an indexing job."""
+    job = indexing_job_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 # --- Chat & Session Management ---
 
+async def _ensure_user(db: AsyncSession):
+    # Concurrent first requests may all try to create the default user
+    if await db.get(User, 1) is None:
+        await db.execute(insert_ignore(User, [{"id": 1}]))
+
+async def _save_turns(
+    db: AsyncSession,
+    session_id: Optional[int],
+    turns: List[Tuple[str, str]]
+) -> Tuple[int, List[Message]]:
+    """
+    Persist (question, answer) turns in a single transaction.
+    
+    Creates the session if `session_id` is not set (titled after the first
+    question), otherwise bumps `updated_at` of the existing one, and saves
+    the user and assistant messages together.
+    Returns (session_id, assistant messages).
+    """
+    if not session_id:
+        await _ensure_user(db)
+        new_session = Session(user_id=1, title=turns[0][0][:30] + "...")
+        db.add(new_session)
+        await db.flush()
+        session_id = new_session.id
+    else:
+        await db.execute(
+            update(Session).where(Session.id == session_id).values(updated_at=func.now())
+        )
+    
+    ai_msgs = []
+    for query, answer in turns:
+        ai_msg = Message(session_id=session_id, role="assistant", content=answer)
+        db.add_all([Message(session_id=session_id, role="user", content=query), ai_msg])
+        ai_msgs.append(ai_msg)
+    await db.commit()
+    return session_id, ai_msgs
+
+async def _save_chat_turn(request: ChatRequest, answer: str, db: AsyncSession) -> Tuple[int, Message]:
+    """Persist one chat turn. Returns (session_id, assistant message)."""
+    session_id, ai_msgs = await _save_turns(db, request.session_id, [(request.query, answer)])
+    return session_id, ai_msgs[0]
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
     db: AsyncSession = Depends(get_db)
 ):
-    """Send a query to the RAG system."""
-    # 1. Get or Create Session
-    if not request.session_id:
-        result = await db.execute(select(User).where(User.id == 1))
-        user = result.scalar_one_or_none()
-        if not user:
-            user = User(id=1)
-            db.add(user)
-            await db.commit()
-            
-        new_session = Session(user_id=1, title=request.query[:30] + "...")
-        db.add(new_session)
-        await db.commit()
-        await db.refresh(new_session)
-        session_id = new_session.id
-    else:
-        session_id = request.session_id
-        
-    # 2. Save User Message
-    user_msg = Message(
-        session_id=session_id,
-        role="user",
-        content=request.query
-    )
-    db.add(user_msg)
-    await db.commit()
+    """
+    Send a query to the RAG system.
     
-    # 3. Get Response from LLM Service (with new params)
-    try:
-        result = await llm_service.generate_response(
-            query=request.query,
-            session_id=session_id,
-            db=db,
-            model_name=request.model_name,
-            top_k=request.top_k,
-            doc_filter=request.doc_filter
-        )
-        response_text = result["response"]
-        context_chunks = result["context"]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"RAG generation failed: {str(e)}")
-    
-    # 4. Save Assistant Message
-    ai_msg = Message(
-        session_id=session_id,
-        role="assistant",
-        content=response_text
+    The answer is generated first; the session and both messages are then
+    written in one transaction, and the query metric is queued for the
+    batched metrics writer.
+    """
+    with telemetry.track_in_flight("chat"), telemetry.request_timings() as timings:
+        try:
+            result = await llm_service.generate_response(
+                query=request.query,
+                model_name=request.model_name,
+                top_k=request.top_k,
+                doc_filter=request.doc_filter,
+                document_ids=request.document_ids
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"RAG generation failed: {str(e)}")
+        
+        with telemetry.stage("db_write"):
+            session_id, _ = await _save_chat_turn(request, result["response"], db)
+    metrics_writer.record(
+        session_id, request.query, result["latency_ms"], len(result["context"]),
+        request.model_name, stage_timings=timings
     )
-    db.add(ai_msg)
-    await db.commit()
     
     return ChatResponse(
-        response=response_text,
+        response=result["response"],
         session_id=session_id,
         citations=[], 
-        context=context_chunks # Return context for UI
+        context=result["context"], # Return context for UI
+        cached=result["cached"],
+        tokens_saved=result["tokens_saved"]
     )
 
-@router.get("/sessions", response_model=List[SessionResponse])
-async def list_sessions(db: AsyncSession = Depends(get_db)):
-    """List all chat sessions."""
-    result = await db.execute(
-        select(Session).where(Session.user_id == 1).order_by(desc(Session.updated_at))
+@router.post("/chat/batch")
+async def chat_batch(request: BatchChatRequest):
+    """
+    Answer many questions in one call, streamed back as NDJSON.
+    
+    Queries are embedded and searched in batches and answers are generated
+    with bounded concurrency. Each line is one result as soon as it is
+    ready: {"index", "response", "cached", "tokens_saved", "latency_ms"}
+    (plus "context" if include_context), or {"index", "error"}. A final
+    {"done": true, ...} line carries the counts and, with persist, the
+    session the turns were saved to.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No queries given")
+    if len(request.items) > settings.batch_max_queries:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.batch_max_queries} queries per batch"
+        )
+    model_name = request.model_name or settings.gemini_model
+    concurrency = min(
+        request.concurrency or settings.batch_generation_concurrency,
+        settings.batch_generation_concurrency
+    )
+    items = [item.model_dump() for item in request.items]
+    
+    async def result_lines():
+        with telemetry.track_in_flight("chat_batch"):
+            answered = {}
+            errors = 0
+            async for result in llm_service.generate_batch(items, model_name, max(concurrency, 1)):
+                if "error" in result:
+                    errors += 1
+                else:
+                    answered[result["index"]] = result
+                line = result if request.include_context else {
+                    k: v for k, v in result.items() if k != "context"
+                }
+                yield json.dumps(line, default=str) + "\n"
+            
+            summary = {"done": True, "count": len(items), "answered": len(answered), "errors": errors}
+            if request.persist and answered:
+                # One transaction for the whole batch, in question order
+                order = sorted(answered)
+                async with AsyncSessionLocal() as db:
+                    session_id, _ = await _save_turns(
+                        db, request.session_id,
+                        [(items[i]["query"], answered[i]["response"]) for i in order]
+                    )
+                for i in order:
+                    metrics_writer.record(
+                        session_id, items[i]["query"], answered[i]["latency_ms"],
+                        len(answered[i]["context"]), model_name
+                    )
+                summary["session_id"] = session_id
+            yield json.dumps(summary) + "\n"
+    
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Send a query to the RAG system and stream the answer as Server-Sent Events.
+    
+    Events: 'context' (retrieved chunks), 'token' (answer text as it is
+    generated), then 'done' (session/message IDs and timing) or 'error'.
+    The chat turn is saved in one transaction once the stream completes.
+    """
+    request_start = time.time()
+    
+    async def event_stream():
+        with telemetry.track_in_flight("chat_stream"), telemetry.request_timings() as timings:
+            try:
+                async for event in llm_service.stream_response(
+                    query=request.query,
+                    model_name=request.model_name,
+                    top_k=request.top_k,
+                    doc_filter=request.doc_filter,
+                    document_ids=request.document_ids
+                ):
+                    if event["event"] != "done":
+                        yield _sse(event["event"], event["data"])
+                        continue
+                        
+                    # The request-scoped session is closed once streaming starts
+                    with telemetry.stage("db_write"):
+                        async with AsyncSessionLocal() as db:
+                            session_id, ai_msg = await _save_chat_turn(request, event["data"]["response"], db)
+                    
+                    timing = event["data"]["timing"]
+                    metrics_writer.record(
+                        session_id, request.query, timing["total_ms"],
+                        event["data"]["chunks_retrieved"], request.model_name,
+                        stage_timings=timings
+                    )
+                    timing["request_ms"] = int((time.time() - request_start) * 1000)
+                    yield _sse("done", {
+                        "session_id": session_id,
+                        "message_id": ai_msg.id,
+                        "cached": event["data"]["cached"],
+                        "tokens_saved": event["data"]["tokens_saved"],
+                        "timing": timing
+                    })
+            except Exception as e:
+                yield _sse("error", {"detail": f"RAG generation failed: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    return result.scalars().all()
 
-@router.get("/sessions/{session_id}/messages", response_model=List[MessageResponse])
+@router.get("/sessions", response_model=SessionListResponse)
+async def list_sessions(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    """List chat sessions, most recently active first, one page at a time."""
+    query = select(
+        Session.id, Session.title, Session.created_at, Session.updated_at
+    ).where(Session.user_id == 1)
+    rows, next_cursor = await _keyset_page(db, query, Session.updated_at, Session.id, cursor, limit)
+    return {"items": rows, "next_cursor": next_cursor}
+
+@router.get("/sessions/{session_id}/messages", response_model=MessageListResponse)
 async def get_session_messages(
     session_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get message history for a session."""
-    result = await db.execute(
-        select(Message).where(Message.session_id == session_id).order_by(Message.created_at)
-    )
-    return result.scalars().all()
+    """
+    Get message history for a session.
+    
+    The first page holds the latest messages; next_cursor pages back to
+    older ones. Messages within a page are in chronological order.
+    """
+    # Retrieved context is not part of the history view, so it is never loaded
+    query = select(
+        Message.id, Message.role, Message.content, Message.created_at, Message.citations
+    ).where(Message.session_id == session_id)
+    rows, next_cursor = await _keyset_page(db, query, Message.created_at, Message.id, cursor, limit)
+    return {"items": list(reversed(rows)), "next_cursor": next_cursor}
 
 @router.post("/sessions", response_model=SessionResponse)
 async def create_session(db: AsyncSession = Depends(get_db)):
     """Create a new empty session."""
-    result = await db.execute(select(User).where(User.id == 1))
-    user = result.scalar_one_or_none()
-    if not user:
-        user = User(id=1)
-        db.add(user)
-        await db.commit()
-        
+    await _ensure_user(db)
     new_session = Session(user_id=1, title="New Chat")
     db.add(new_session)
     await db.commit()
     await db.refresh(new_session)
     return new_session
+
+# --- Cache Stats ---
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss statistics for the embedding and answer caches, for sizing them."""
+    return {
+        "query_embeddings": retrieval_service.query_cache.stats(),
+        "embeddings": embedding_cache.stats(),
+        "answers": answer_cache.stats(),
+        "coalescing": {
+            "retrieval": retrieval_service.inflight.stats(),
+            "generation": llm_service.inflight.stats()
+        }
+    }
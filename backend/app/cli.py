@@ -0,0 +1,111 @@
+"""
+Command-line bulk ingestion of a local directory of PDFs (and ZIP archives of PDFs).
+
+Runs the same pipeline as the bulk upload endpoint, in-process: files are
+copied into the upload directory, deduplicated by content hash against the
+database, and indexed by the background queue while aggregate progress is
+printed. Interrupting it leaves unfinished documents in 'indexing' status;
+the API server resumes them on its next start.
+
+Usage (from backend/):
+    python -m app.cli ingest ./papers
+    python -m app.cli ingest ./papers --recursive --interval 5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from typing import List, Tuple
+
+from app.config import settings
+from app.db.init_db import init_database
+from app.services.embeddings import embedding_provider
+from app.services.indexing_service import indexing_service
+from app.services.ingest_service import ingest_service
+from app.services.job_service import indexing_job_queue
+from app.services.storage import SavedUpload, UnsupportedFileType, extract_zip_pdfs, save_local_pdf
+from app.services.vector_store import qdrant_connection
+
+
+def find_files(directory: str, recursive: bool) -> List[str]:
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".")) if recursive else []
+        paths.extend(
+            os.path.join(root, name) for name in sorted(files)
+            if name.lower().endswith((".pdf", ".zip")) and not name.startswith(".")
+        )
+    return paths
+
+
+async def ingest(directory: str, recursive: bool, interval: float) -> int:
+    paths = find_files(directory, recursive)
+    if not paths:
+        print(f"⚠️ No PDF or ZIP files in {directory}")
+        return 1
+
+    os.makedirs(settings.upload_dir, exist_ok=True)
+    await init_database()
+    await indexing_job_queue.start()
+    try:
+        uploads: List[SavedUpload] = []
+        rejected: List[Tuple[str, str]] = []
+        for path in paths:
+            if path.lower().endswith(".zip"):
+                uploads.extend(await asyncio.to_thread(
+                    extract_zip_pdfs, path, os.path.basename(path),
+                    sys.maxsize, sys.maxsize, settings.bulk_max_files, rejected
+                ))
+                continue
+            try:
+                uploads.append(await save_local_pdf(path))
+            except UnsupportedFileType as e:
+                rejected.append((os.path.basename(path), str(e)))
+
+        batch = await ingest_service.ingest(uploads, rejected)
+        for item in batch.items:
+            if item.error:
+                print(f"⏭️ {item.filename}: {item.error}")
+            elif item.duplicate:
+                print(f"♻️ {item.filename}: already indexed as document {item.document_id}")
+
+        last = None
+        while True:
+            p = batch.progress()
+            if p != last:  # only print when something moved
+                last = p
+                print(f"📊 {p.done}/{len(batch.jobs)} documents done, {p.running} running, {p.queued} queued, "
+                      f"{p.failed} failed | pages {p.pages_parsed} ({p.pages_skipped} unchanged) | "
+                      f"chunks {p.chunks_upserted}/{p.chunks_total}")
+            if batch.status == "done":
+                break
+            await asyncio.sleep(interval)
+
+        for job in batch.jobs:
+            if job.status == "error":
+                print(f"❌ Document {job.document_id}: {job.error}")
+        return 1 if batch.progress().failed else 0
+    finally:
+        await indexing_job_queue.stop()
+        indexing_service.shutdown()
+        embedding_provider.shutdown()
+        await qdrant_connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = commands.add_parser("ingest", help="Index every PDF (and ZIP of PDFs) in a directory")
+    ingest_parser.add_argument("directory")
+    ingest_parser.add_argument("--recursive", "-r", action="store_true", help="Include subdirectories")
+    ingest_parser.add_argument("--interval", type=float, default=2.0, help="Seconds between progress checks")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"not a directory: {args.directory}")
+    sys.exit(asyncio.run(ingest(args.directory, args.recursive, args.interval)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -8,9 +8,21 @@ class Settings(BaseSettings):
     # Gemini API
     gemini_api_key: str
     gemini_model: str = "gemini-2.5-flash"
+    llm_temperature: float = 0.3
+    llm_warmup_models: str = ""  # comma-separated, e.g. "gemini-2.5-flash,gemini-2.5-pro"
+    llm_warmup_ping: bool = False
     
-    # Embedding Model (using Gemini)
-    embedding_model: str = "models/embedding-001"
+    # Embedding Model
+    embedding_provider: str = "gemini"  # gemini, local (ONNX or NumPy model on CPU) or hashing (deterministic, for tests)
+    embedding_model: str = "models/embedding-001"  # Gemini model name
+    embedding_model_path: str = ""  # local: directory with model.onnx + tokenizer.json, or model.npz
+    embedding_dim: int = 768  # hashing only; local models report their own
+    embedding_local_threads: int = 2  # CPU inference threads shared by indexing and queries
+    embedding_local_batch_size: int = 32  # texts per forward pass
+    embedding_max_length: int = 256  # ONNX: tokens per text, longer texts are truncated
+    # Instruction prefixes some local models expect (e.g. "query: " / "passage: " for E5)
+    embedding_query_prefix: str = ""
+    embedding_document_prefix: str = ""
     
     # PostgreSQL
     postgres_user: str = "postgres"
@@ -18,24 +30,111 @@ class Settings(BaseSettings):
     postgres_db: str = "rag_db"
     postgres_host: str = "postgres"
     postgres_port: int = 5432
+    # Full SQLAlchemy URL that replaces the Postgres one (e.g. SQLite for benchmarks)
+    database_url_override: str = ""
+    database_echo: bool = True
     
     # Qdrant
     qdrant_url: str = "http://qdrant:6333"
     qdrant_collection_name: str = "pdf_documents"
+    qdrant_prefer_grpc: bool = False
+    qdrant_grpc_port: int = 6334
+    qdrant_timeout: int = 10
+    # Collection layout, applied when the collection is bootstrapped
+    qdrant_quantization: str = "none"  # none, scalar (int8) or binary
+    qdrant_quantization_always_ram: bool = True  # keep quantized vectors in RAM
+    qdrant_vectors_on_disk: bool = False  # original full-precision vectors on disk (mmap)
+    qdrant_hnsw_m: int = 16
+    qdrant_hnsw_ef_construct: int = 100
+    qdrant_hnsw_on_disk: bool = False
+    # Search-time options
+    qdrant_search_ef: int = 0  # 0 = Qdrant default
+    qdrant_search_rescore: bool = True  # re-rank quantized candidates with original vectors
+    qdrant_search_oversampling: float = 1.0  # fetch top_k * oversampling quantized candidates
     
     # Application
     upload_dir: str = "/app/uploads"
+    max_upload_mb: int = 100  # per PDF; larger uploads are rejected while streaming
+    max_bulk_upload_mb: int = 2048  # whole bulk request (PDFs and ZIP archives)
+    bulk_max_files: int = 1000
     chunk_size: int = 1000
     chunk_overlap: int = 300
     default_top_k: int = 4
-    
+
+    # Prompt context packing
+    context_token_budget: int = 8000
+    context_token_budgets: str = ""  # per model, e.g. "gemini-2.5-flash=8000,gemini-2.5-pro=32000"
+    context_chars_per_token: float = 4.0
+
+    # Batch question API
+    batch_max_queries: int = 1000
+    batch_generation_concurrency: int = 8
+    batch_search_size: int = 64
+
+    # Background indexing
+    indexing_workers: int = 2
+    indexing_queue_size: int = 100
+    indexing_job_history: int = 500
+    indexing_upsert_concurrency: int = 2  # Qdrant upserts in flight across all documents
+    indexing_resume_on_startup: bool = True  # else interrupted documents are cleaned up and marked 'error'
+    pdf_parse_workers: int = 2
+    pdf_max_pages_per_task: int = 50
+    pdf_parse_window: int = 4
+
+    # Embedding stage
+    embedding_batch_size: int = 64
+    embedding_min_batch_size: int = 8
+    embedding_max_batch_size: int = 100
+    embedding_concurrency: int = 4
+    embedding_target_latency_ms: int = 2000
+    embedding_max_retries: int = 6
+    embedding_backoff_base: float = 1.0
+    embedding_backoff_max: float = 60.0
+
+    # Persistent embedding cache
+    embedding_cache_enabled: bool = True
+    embedding_cache_max_entries: int = 200_000
+    embedding_cache_evict_every: int = 1000
+
+    # Query embedding LRU (in-process)
+    query_cache_max_entries: int = 2048
+    query_cache_ttl_seconds: int = 3600
+
+    # Semantic answer cache (in-process)
+    answer_cache_enabled: bool = True
+    answer_cache_threshold: float = 0.95
+    answer_cache_max_entries: int = 1000
+    answer_cache_ttl_seconds: int = 86400
+
+    # Batched metrics writer
+    metrics_batch_size: int = 200
+    metrics_flush_interval: float = 2.0
+    metrics_queue_size: int = 10_000
+    # Also store per-stage timings and token counts on each Metric row
+    metrics_persist_stages: bool = False
+
     class Config:
         env_file = ".env"
         case_sensitive = False
     
+    @property
+    def llm_warmup_model_list(self) -> List[str]:
+        return [m.strip() for m in self.llm_warmup_models.split(",") if m.strip()]
+    
+    @property
+    def context_token_budget_map(self) -> Dict[str, int]:
+        budgets = {}
+        for entry in self.context_token_budgets.split(","):
+            if "=" in entry:
+                model, budget = entry.split("=", 1)
+                budgets[model.strip()] = int(budget)
+        return budgets
+    
     @property
     def database_url(self) -> str:
         """Construct async PostgreSQL connection URL."""
+        if self.database_url_override:
+            return self.database_url_override
         return (
             f"postgresql+asyncpg://{self.postgres_user}:{self.postgres_password}"
             f"@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
@@ -1,6 +1,30 @@
 
+from sqlalchemy import inspect, text
+
 from app.db.session import engine, Base
-from app.models.models import User, Session, Document, Message, Metric
+from app.models.models import User, Session, Document, DocumentPage, Message, Metric, EmbeddingCacheEntry
+
+
+def _add_missing_columns(sync_conn):
+    """Add nullable columns introduced since a table was created (create_all never alters tables)."""
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                print(f"⚠️ Column {table.name}.{column.name} is missing and not nullable, add it manually")
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            print(f"✅ Added column {table.name}.{column.name}")
+
+
+def _create_missing_indexes(sync_conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
 
 
 async def init_database():
@@ -9,6 +33,9 @@ async def init_database():
         async with engine.begin() as conn:
             # Create all tables
             await conn.run_sync(Base.metadata.create_all)
+            # create_all skips tables that already exist; add columns and indexes introduced since
+            await conn.run_sync(_add_missing_columns)
+            await conn.run_sync(_create_missing_indexes)
         print("✅ Database tables created successfully")
     except Exception as e:
         print(f"❌ Error creating database tables: {e}")
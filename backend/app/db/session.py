@@ -1,12 +1,12 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from typing import AsyncGenerator
+from typing import AsyncGenerator, List
 from app.config import settings
 
 # Create async engine
 engine = create_async_engine(
     settings.database_url,
-    echo=True,  
+    echo=settings.database_echo,
     future=True,
     pool_pre_ping=True,
     pool_size=10,
@@ -26,6 +26,15 @@ AsyncSessionLocal = async_sessionmaker(
 Base = declarative_base()
 
 
+def insert_ignore(model, rows: List[dict]):
+    """INSERT ... ON CONFLICT DO NOTHING for the active dialect."""
+    if engine.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model).values(rows).on_conflict_do_nothing()
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency for FastAPI routes to get database session.
@@ -38,7 +47,9 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         try:
             yield session
-            await session.commit()
+            # Most routes commit explicitly or only read; skip the extra round-trip
+            if session.new or session.dirty or session.deleted:
+                await session.commit()
         except Exception:
             await session.rollback()
             raise
@@ -4,12 +4,23 @@ Initializes the API, database, and routes.
 """
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import os
 
 from app.config import settings
 from app.db.init_db import init_database
+from app.services.answer_cache import answer_cache
+from app.services.embedding_cache import embedding_cache
+from app.services.embeddings import embedding_provider
+from app.services.job_service import indexing_job_queue
+from app.services.indexing_service import indexing_service
+from app.services.llm_pool import llm_client_pool
+from app.services.metrics_writer import metrics_writer
+from app.services.retrieval_service import retrieval_service
+from app.services.telemetry import telemetry, CallbackGauge, labels
+from app.services.vector_store import qdrant_connection
 
 
 @asynccontextmanager
@@ -20,6 +31,7 @@ async def lifespan(app: FastAPI):
 
     print(f"🔍 Qdrant URL: {settings.qdrant_url}")
     print(f"🤖 Gemini Model: {settings.gemini_model}")
+    print(f"🧬 Embeddings: {embedding_provider.name} ({settings.embedding_provider})")
     
     # Create upload directory
     os.makedirs(settings.upload_dir, exist_ok=True)
@@ -28,10 +40,28 @@ async def lifespan(app: FastAPI):
     await init_database()
     print("✅ Database initialized")
     
+    # Start background indexing workers
+    await indexing_job_queue.start()
+    await indexing_job_queue.backfill_document_ids()
+    # Resume (or clean up) documents whose indexing was cut off by a restart
+    await indexing_job_queue.recover()
+    
+    # Start batched metrics writer
+    await metrics_writer.start()
+    
+    # Pre-create LLM clients for configured models
+    if settings.llm_warmup_model_list:
+        await llm_client_pool.warm_up(settings.llm_warmup_model_list)
+    
     yield
     
     # Shutdown
     print("👋 Shutting down...")
+    await indexing_job_queue.stop()
+    await metrics_writer.stop()
+    indexing_service.shutdown()
+    embedding_provider.shutdown()
+    await qdrant_connection.close()
 
 
 # Create FastAPI app
@@ -65,6 +95,31 @@ async def health_check():
     }
 
 
+# Gauges read from service state at scrape time
+telemetry.register(CallbackGauge(
+    "rag_cache_hit_ratio", "Hit ratio of each cache since startup",
+    lambda: {
+        labels(cache="query_embeddings"): retrieval_service.query_cache.stats()["hit_rate"],
+        labels(cache="embeddings"): embedding_cache.stats()["hit_rate"],
+        labels(cache="answers"): answer_cache.stats()["hit_rate"],
+    }
+))
+telemetry.register(CallbackGauge(
+    "rag_indexing_jobs", "Known indexing jobs by status",
+    lambda: {labels(status=s): n for s, n in indexing_job_queue.status_counts().items()}
+))
+telemetry.register(CallbackGauge(
+    "rag_metrics_writer_buffered", "Metric rows waiting to be written",
+    lambda: {labels(): metrics_writer.stats()["buffered"]}
+))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage latencies, token counts, cache hit ratios and in-flight gauges (Prometheus text format)."""
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
+
+
 # Include API router
 from app.api.endpoints import router as api_router
 app.include_router(api_router, prefix="/api", tags=["api"])
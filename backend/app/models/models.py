@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, LargeBinary, Index
 from sqlalchemy.sql import func
 from app.db.session import Base
 
@@ -14,6 +14,10 @@ class User(Base):
 class Session(Base):
     """Chat sessions table."""
     __tablename__ = "sessions"
+    __table_args__ = (
+        # Keyset pagination of a user's sessions, most recently active first
+        Index("ix_sessions_user_updated", "user_id", "updated_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -25,6 +29,9 @@ class Session(Base):
 class Document(Base):
     """Uploaded PDF documents table."""
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_created", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String(500), nullable=False)
@@ -32,12 +39,29 @@ class Document(Base):
     status = Column(String(50), default="indexing", nullable=False)  # indexing, indexed, error
     num_pages = Column(Integer)
     num_chunks = Column(Integer)
+    # Progress of the current indexing run, committed after every upserted batch
+    checkpoint_page = Column(Integer)  # pages before this one are fully indexed
+    checkpoint_chunks = Column(Integer)  # chunks upserted so far in this run
+    checkpoint_at = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
 
+class DocumentPage(Base):
+    """Per-page content hashes of an indexed document, so re-indexing can skip unchanged pages."""
+    __tablename__ = "document_pages"
+    
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    page = Column(Integer, primary_key=True)
+    content_hash = Column(String(64), nullable=False)
+    num_chunks = Column(Integer, nullable=False)
+
+
 class Message(Base):
     """Chat messages table with citations."""
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_session_created", "session_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -58,4 +82,23 @@ class Metric(Base):
     latency_ms = Column(Integer)
     chunks_retrieved = Column(Integer)
     model_used = Column(String(100))
+    # Per-stage breakdown, filled when settings.metrics_persist_stages is on
+    embed_ms = Column(Integer)
+    search_ms = Column(Integer)
+    prompt_ms = Column(Integer)
+    llm_ms = Column(Integer)
+    db_ms = Column(Integer)
+    input_tokens = Column(Integer)
+    output_tokens = Column(Integer)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class EmbeddingCacheEntry(Base):
+    """Content-addressed embedding cache: float32 vectors keyed by model and SHA-256 of the text."""
+    __tablename__ = "embedding_cache"
+    
+    model = Column(String(200), primary_key=True)
+    text_hash = Column(String(64), primary_key=True)
+    vector = Column(LargeBinary, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
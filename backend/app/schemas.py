@@ -8,7 +8,22 @@ class ChatRequest(BaseModel):
     # New Settings
     model_name: str = "gemini-1.5-flash"
     top_k: int = 4
-    doc_filter: Optional[str] = None
+    doc_filter: Optional[str] = None  # stored filename; prefer document_ids
+    document_ids: Optional[List[int]] = None  # restrict retrieval to these documents
+
+class BatchChatItem(BaseModel):
+    query: str
+    top_k: int = 4
+    doc_filter: Optional[str] = None  # stored filename; prefer document_ids
+    document_ids: Optional[List[int]] = None  # restrict retrieval to these documents
+
+class BatchChatRequest(BaseModel):
+    items: List[BatchChatItem]
+    model_name: Optional[str] = None  # defaults to settings.gemini_model
+    concurrency: Optional[int] = None  # capped at settings.batch_generation_concurrency
+    persist: bool = False  # save the questions and answers as a chat session
+    session_id: Optional[int] = None  # append to this session instead of creating one
+    include_context: bool = False
 
 class ChatResponse(BaseModel):
     response: str
@@ -16,6 +31,8 @@ class ChatResponse(BaseModel):
     citations: Optional[List[Any]] = None
     # New Context Return
     context: Optional[List[Dict[str, Any]]] = None
+    cached: bool = False
+    tokens_saved: int = 0
 
 class DocumentResponse(BaseModel):
     id: int
@@ -27,10 +44,69 @@ class DocumentResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class IndexingProgressResponse(BaseModel):
+    pages_parsed: int
+    pages_skipped: int = 0
+    chunks_total: int
+    chunks_embedded: int
+    chunks_upserted: int
+
+    class Config:
+        from_attributes = True
+
+class IndexingJobResponse(BaseModel):
+    id: str
+    document_id: int
+    status: str
+    error: Optional[str] = None
+    progress: IndexingProgressResponse
+
+    class Config:
+        from_attributes = True
+
+class DocumentStatusResponse(DocumentResponse):
+    num_pages: Optional[int] = None
+    num_chunks: Optional[int] = None
+    job: Optional[IndexingJobResponse] = None
+    duplicate: bool = False
+
+class BulkUploadItem(BaseModel):
+    filename: str
+    document_id: Optional[int] = None
+    duplicate: bool = False
+    error: Optional[str] = None  # set when the file was rejected
+
+    class Config:
+        from_attributes = True
+
+class BulkProgressResponse(BaseModel):
+    files: int
+    duplicates: int
+    rejected: int
+    queued: int
+    running: int
+    done: int
+    failed: int
+    pages_parsed: int
+    pages_skipped: int
+    chunks_total: int
+    chunks_embedded: int
+    chunks_upserted: int
+
+    class Config:
+        from_attributes = True
+
+class BulkUploadResponse(BaseModel):
+    batch_id: str
+    status: str  # indexing, done
+    items: List[BulkUploadItem]
+    progress: BulkProgressResponse
+
 class SessionResponse(BaseModel):
     id: int
     title: str
     created_at: datetime
+    updated_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
@@ -44,3 +120,16 @@ class MessageResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+# Keyset-paginated lists: pass next_cursor back as ?cursor= for the next page
+class DocumentListResponse(BaseModel):
+    items: List[DocumentResponse]
+    next_cursor: Optional[str] = None
+
+class SessionListResponse(BaseModel):
+    items: List[SessionResponse]
+    next_cursor: Optional[str] = None
+
+class MessageListResponse(BaseModel):
+    items: List[MessageResponse]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,157 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+Scope = Tuple[Optional[str], Optional[Tuple[int, ...]], str, int]  # (doc_filter, document_ids, model_name, top_k)
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    context: List[Dict[str, Any]]
+    latency_ms: int
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache matched by query-embedding similarity.
+
+    A new query reuses a previous answer when the cosine similarity of their
+    embeddings is at least `answer_cache_threshold` and the previous answer
+    was produced for the same scope (doc_filter, document_ids, model_name,
+    top_k). Every
+    entry is tagged with the corpus version it was generated against; when
+    the set of indexed documents changes the version is bumped and all
+    entries are dropped. An answer whose generation spans a bump is never
+    stored.
+
+    The version lives in this process only: documents indexed by another
+    process (e.g. `python -m app.cli ingest` next to a running server) do
+    not invalidate the server's cache, whose entries then expire with
+    `answer_cache_ttl_seconds`.
+    """
+
+    def __init__(self):
+        self.enabled = settings.answer_cache_enabled
+        self.threshold = settings.answer_cache_threshold
+        self.max_entries = max(1, settings.answer_cache_max_entries)
+        self.ttl_seconds = settings.answer_cache_ttl_seconds
+        self.corpus_version = 0
+
+        # Per scope: unit-normalised query vectors (one row each) and their answers
+        self._vectors: Dict[Scope, np.ndarray] = {}
+        self._answers: Dict[Scope, List[CachedAnswer]] = {}
+        self._size = 0
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved_ms = 0
+        self.invalidations = 0
+
+    def bump_corpus_version(self):
+        """Invalidate every entry; call whenever a document is indexed or removed."""
+        self.corpus_version += 1
+        self.invalidations += 1
+        self._vectors.clear()
+        self._answers.clear()
+        self._size = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def lookup(self, query_vector: List[float], scope: Scope) -> Optional[CachedAnswer]:
+        if not self.enabled:
+            return None
+        self._prune_expired(scope)
+        vectors = self._vectors.get(scope)
+        if vectors is None or not len(vectors):
+            self.misses += 1
+            return None
+
+        similarities = vectors @ self._normalize(query_vector)
+        best = int(np.argmax(similarities))
+        entry = self._answers[scope][best]
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.latency_saved_ms += entry.latency_ms
+        return entry
+
+    def store(
+        self,
+        query_vector: List[float],
+        scope: Scope,
+        answer: str,
+        context: List[Dict[str, Any]],
+        latency_ms: int,
+        corpus_version: int
+    ):
+        """
+        Cache an answer. `corpus_version` is the version read before retrieval
+        started: if documents changed since, the answer may be stale and is dropped.
+        """
+        if not self.enabled or corpus_version != self.corpus_version:
+            return
+        self._prune_expired(scope)
+        row = self._normalize(query_vector)[np.newaxis, :]
+        vectors = self._vectors.get(scope)
+        self._vectors[scope] = row if vectors is None else np.vstack([vectors, row])
+        self._answers.setdefault(scope, []).append(CachedAnswer(answer, context, latency_ms))
+        self._size += 1
+        if self._size > self.max_entries:
+            self._evict_oldest()
+
+    def _prune_expired(self, scope: Scope):
+        """Drop a scope's entries older than the TTL (they are stored oldest first)."""
+        answers = self._answers.get(scope)
+        if not self.ttl_seconds or not answers:
+            return
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = 0
+        while expired < len(answers) and answers[expired].created_at < cutoff:
+            expired += 1
+        if not expired:
+            return
+        self._size -= expired
+        if expired == len(answers):
+            del self._answers[scope]
+            del self._vectors[scope]
+        else:
+            del answers[:expired]
+            self._vectors[scope] = self._vectors[scope][expired:]
+
+    def _evict_oldest(self):
+        scope = min(self._answers, key=lambda s: self._answers[s][0].created_at)
+        self._answers[scope].pop(0)
+        self._vectors[scope] = self._vectors[scope][1:]
+        if not self._answers[scope]:
+            del self._answers[scope]
+            del self._vectors[scope]
+        self._size -= 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": self._size,
+            "corpus_version": self.corpus_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "latency_saved_ms": self.latency_saved_ms,
+            "invalidations": self.invalidations,
+        }
+
+
+# Singleton instance
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,153 @@
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+Chunk = Dict[str, Any]
+
+# Shortest suffix/prefix match treated as splitter overlap rather than coincidence
+MIN_TEXT_OVERLAP = 20
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer call) used for budgeting."""
+    return math.ceil(len(text) / settings.context_chars_per_token)
+
+
+def _text_overlap(left: str, right: str, max_overlap: int) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    for size in range(min(len(left), len(right), max_overlap), MIN_TEXT_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+@dataclass
+class _Block:
+    """Consecutive chunks of one page merged into a single passage."""
+    text: str
+    start: Optional[int]
+    rank: int
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def end(self) -> Optional[int]:
+        return None if self.start is None else self.start + len(self.text)
+
+
+@dataclass
+class PackedContext:
+    chunks: List[Chunk]
+    tokens_before: int
+    tokens_after: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(self.tokens_before - self.tokens_after, 0)
+
+
+class ContextPacker:
+    """
+    Turns retrieved chunks into the context that goes into the prompt.
+
+    Chunks from the same source and page that overlap or touch are merged
+    into one passage with the repeated splitter overlap removed. Overlap is
+    found from the chunks' `start_index` when it was stored at indexing time,
+    otherwise by matching the end of one chunk against the start of the
+    next (in `chunk_index` order), in a single pass over the sorted chunks.
+    Passages are then added in relevance order until the model's token
+    budget is used up; the passage that crosses the budget is truncated at
+    the last word boundary.
+    """
+
+    def __init__(self):
+        self.max_overlap = settings.chunk_overlap
+        self.default_budget = settings.context_token_budget
+        self.budgets = settings.context_token_budget_map
+
+    def budget_for(self, model_name: str) -> int:
+        return self.budgets.get(model_name, self.default_budget)
+
+    def _merge_by_offset(self, blocks: List[_Block]) -> List[_Block]:
+        merged: List[_Block] = []
+        for block in sorted(blocks, key=lambda b: b.start):
+            previous = merged[-1] if merged else None
+            if previous is None or block.start > previous.end:
+                merged.append(block)  # a gap: not adjacent
+                continue
+            # Touching chunks are joined; a chunk fully inside the previous passage adds nothing
+            previous.text += block.text[previous.end - block.start:]
+            previous.rank = min(previous.rank, block.rank)
+        return merged
+
+    def _merge_by_text(self, blocks: List[_Block]) -> List[_Block]:
+        # No offsets: document order comes from chunk_index when stored, else relevance order
+        if all(block.metadata.get("chunk_index") is not None for block in blocks):
+            blocks = sorted(blocks, key=lambda b: b.metadata["chunk_index"])
+        else:
+            blocks = sorted(blocks, key=lambda b: b.rank)
+        merged: List[_Block] = []
+        for block in blocks:
+            previous = merged[-1] if merged else None
+            if previous is None:
+                merged.append(block)
+                continue
+            overlap = _text_overlap(previous.text, block.text, self.max_overlap)
+            if overlap:
+                previous.text += block.text[overlap:]
+            else:
+                # Relevance order may put the later chunk first
+                overlap = _text_overlap(block.text, previous.text, self.max_overlap)
+                if not overlap:
+                    merged.append(block)
+                    continue
+                previous.text = block.text + previous.text[overlap:]
+            previous.rank = min(previous.rank, block.rank)
+        return merged
+
+    def _merge(self, chunks: List[Chunk]) -> List[_Block]:
+        pages: Dict[tuple, List[_Block]] = {}
+        for rank, chunk in enumerate(chunks):
+            metadata = chunk["metadata"]
+            key = (metadata.get("source"), metadata.get("page"))
+            pages.setdefault(key, []).append(_Block(
+                text=chunk["page_content"],
+                start=metadata.get("start_index"),
+                rank=rank,
+                metadata=dict(metadata)
+            ))
+
+        merged: List[_Block] = []
+        for blocks in pages.values():
+            if all(block.start is not None for block in blocks):
+                merged.extend(self._merge_by_offset(blocks))
+            else:
+                merged.extend(self._merge_by_text(blocks))
+        return sorted(merged, key=lambda b: b.rank)
+
+    def pack(self, chunks: List[Chunk], model_name: str) -> PackedContext:
+        tokens_before = sum(estimate_tokens(c["page_content"]) for c in chunks)
+        budget = self.budget_for(model_name)
+
+        packed: List[Chunk] = []
+        used = 0
+        for block in self._merge(chunks):
+            remaining = budget - used
+            if remaining <= 0:
+                break
+            text = block.text
+            if estimate_tokens(text) > remaining:
+                text = text[:int(remaining * settings.context_chars_per_token)]
+                # End on a word boundary rather than mid-word
+                cut = max(text.rfind(" "), text.rfind("\n"), text.rfind("\t"))
+                if cut > 0:
+                    text = text[:cut]
+            used += estimate_tokens(text)
+            packed.append({"page_content": text, "metadata": block.metadata})
+
+        return PackedContext(chunks=packed, tokens_before=tokens_before, tokens_after=used)
+
+
+# Singleton instance
+context_packer = ContextPacker()
@@ -0,0 +1,162 @@
+import hashlib
+from array import array
+from typing import Awaitable, Callable, Dict, List
+
+from sqlalchemy import select, update, delete, func, tuple_
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal, insert_ignore
+from app.models.models import EmbeddingCacheEntry
+
+EmbedFn = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def encode_vector(vector: List[float]) -> bytes:
+    """Pack a vector as little-endian float32 (4 bytes per dimension)."""
+    return array("f", vector).tobytes()
+
+
+def decode_vector(data: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(data)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache shared by indexing and retrieval.
+
+    Vectors are stored in Postgres keyed by (model, SHA-256 of the text), so
+    identical chunks across uploads and re-uploads are only embedded once.
+    The table is kept under `embedding_cache_max_entries` by evicting the
+    least recently used rows. Cache failures never fail the caller: they are
+    logged and the texts are embedded as if they had missed.
+    """
+
+    def __init__(self):
+        self.enabled = settings.embedding_cache_enabled
+        self.max_entries = settings.embedding_cache_max_entries
+        self.evict_every = max(1, settings.embedding_cache_evict_every)
+        self._inserts_since_evict = 0
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+    async def get_or_embed(self, model: str, texts: List[str], embed_fn: EmbedFn) -> List[List[float]]:
+        """
+        Return embeddings for `texts`, calling `embed_fn` only for cache misses.
+
+        Args:
+            model: Cache namespace; include anything that changes the vector
+                (model name, query vs document task type).
+            texts: Texts to embed.
+            embed_fn: Async function embedding a list of texts.
+
+        Returns:
+            One vector per input text, in order.
+        """
+        if not self.enabled or not texts:
+            return await embed_fn(texts)
+
+        hashes = [text_hash(t) for t in texts]
+        cached = await self._get_many(model, set(hashes))
+
+        # Each distinct missing text is embedded once; its repeats reuse that vector
+        missing: Dict[str, str] = {}
+        for h, t in zip(hashes, texts):
+            if h not in cached:
+                missing.setdefault(h, t)
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+
+        if missing:
+            new_vectors = await embed_fn(list(missing.values()))
+            fresh = dict(zip(missing.keys(), new_vectors))
+            await self._put_many(model, fresh)
+            cached.update(fresh)
+
+        return [cached[h] for h in hashes]
+
+    async def _get_many(self, model: str, hashes: set) -> Dict[str, List[float]]:
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(EmbeddingCacheEntry.text_hash, EmbeddingCacheEntry.vector).where(
+                        EmbeddingCacheEntry.model == model,
+                        EmbeddingCacheEntry.text_hash.in_(hashes)
+                    )
+                )
+                found = {row.text_hash: decode_vector(row.vector) for row in result}
+                if found:
+                    await db.execute(
+                        update(EmbeddingCacheEntry)
+                        .where(
+                            EmbeddingCacheEntry.model == model,
+                            EmbeddingCacheEntry.text_hash.in_(found.keys())
+                        )
+                        .values(last_used_at=func.now())
+                    )
+                    await db.commit()
+                return found
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Embedding cache read failed: {e}")
+            return {}
+
+    async def _put_many(self, model: str, vectors: Dict[str, List[float]]):
+        rows = [
+            {"model": model, "text_hash": h, "vector": encode_vector(v)}
+            for h, v in vectors.items()
+        ]
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert_ignore(EmbeddingCacheEntry, rows))
+                await db.commit()
+            self._inserts_since_evict += len(rows)
+            if self._inserts_since_evict >= self.evict_every:
+                self._inserts_since_evict = 0
+                await self._evict()
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Embedding cache write failed: {e}")
+
+    async def _evict(self):
+        """Delete the least recently used rows beyond `max_entries`."""
+        async with AsyncSessionLocal() as db:
+            total = await db.scalar(select(func.count()).select_from(EmbeddingCacheEntry))
+            excess = (total or 0) - self.max_entries
+            if excess <= 0:
+                return
+            oldest = (
+                select(EmbeddingCacheEntry.model, EmbeddingCacheEntry.text_hash)
+                .order_by(EmbeddingCacheEntry.last_used_at)
+                .limit(excess)
+            )
+            result = await db.execute(
+                delete(EmbeddingCacheEntry).where(
+                    tuple_(EmbeddingCacheEntry.model, EmbeddingCacheEntry.text_hash).in_(oldest)
+                )
+            )
+            await db.commit()
+            self.evictions += result.rowcount or 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+
+# Singleton instance
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,110 @@
+import asyncio
+import random
+import time
+from typing import Any, List
+
+from app.config import settings
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """Detect quota / rate-limit failures (HTTP 429, RESOURCE_EXHAUSTED) anywhere in the cause chain."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if getattr(exc, "code", None) == 429 or getattr(exc, "status_code", None) == 429:
+            return True
+        message = str(exc).lower()
+        if "429" in message or "resource exhausted" in message or "resource_exhausted" in message or "quota" in message:
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+class AdaptiveBatchEmbedder:
+    """
+    Embedding stage with bounded concurrency, adaptive batch size and backoff.
+
+    - At most `max_concurrency` embedding calls are in flight at once.
+    - The batch size grows while calls finish under `target_latency` and
+      shrinks when they run over it (additive increase, multiplicative decrease).
+    - Rate-limit errors halve the batch size and pause *all* callers for an
+      exponentially growing, jittered delay before retrying.
+    """
+
+    def __init__(self, embeddings: Any):
+        self.embeddings = embeddings
+        self.max_concurrency = max(1, settings.embedding_concurrency)
+        self.min_batch_size = max(1, settings.embedding_min_batch_size)
+        self.max_batch_size = max(self.min_batch_size, settings.embedding_max_batch_size)
+        self.batch_size = min(max(settings.embedding_batch_size, self.min_batch_size), self.max_batch_size)
+        self.target_latency = settings.embedding_target_latency_ms / 1000
+        self.max_retries = settings.embedding_max_retries
+        self.backoff_base = settings.embedding_backoff_base
+        self.backoff_max = settings.embedding_backoff_max
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._resume_at = 0.0
+
+        # Stats
+        self.calls = 0
+        self.rate_limited = 0
+
+    def _adapt(self, batch_len: int, elapsed: float):
+        if batch_len < self.batch_size:
+            return  # a short tail batch says nothing about the ceiling
+        if elapsed > self.target_latency:
+            self.batch_size = max(self.min_batch_size, int(self.batch_size * 0.75))
+        else:
+            step = max(1, self.batch_size // 8)
+            self.batch_size = min(self.max_batch_size, self.batch_size + step)
+
+    async def _wait_for_cooldown(self):
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def embed(self, texts: List[str], attempt: int = 0) -> List[List[float]]:
+        """
+        Embed one batch of texts, retrying with backoff on rate-limit errors.
+
+        If the batch is larger than the (just reduced) batch size when a retry
+        is due, it is split and the parts are retried separately.
+
+        Raises:
+            The last error if retries are exhausted or the error is not a rate limit.
+        """
+        while True:
+            await self._wait_for_cooldown()
+            async with self._semaphore:
+                await self._wait_for_cooldown()
+                started = time.monotonic()
+                try:
+                    self.calls += 1
+                    vectors = await self.embeddings.aembed_documents(texts)
+                except Exception as e:
+                    if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                        raise
+                    error = e
+                else:
+                    self._adapt(len(texts), time.monotonic() - started)
+                    return vectors
+
+            attempt += 1
+            self.rate_limited += 1
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+            delay *= random.uniform(0.5, 1.0)
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+            print(f"⏳ Embedding rate limited ({error}); retry {attempt} in {delay:.1f}s, batch size {self.batch_size}")
+
+            if len(texts) > self.batch_size:
+                parts = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+                results = await asyncio.gather(*(self.embed(part, attempt) for part in parts))
+                return [vector for part in results for vector in part]
+
+    def stats(self) -> dict:
+        return {
+            "batch_size": self.batch_size,
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+        }
@@ -0,0 +1,282 @@
+import asyncio
+import hashlib
+import os
+import re
+from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.config import settings
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalise rows in place (all-zero rows stay zero)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def _tokens(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _model_name(*paths: str) -> str:
+    """
+    Provider name of a local model: a hash of its files' contents.
+
+    Two model directories with the same basename (or one model replaced in
+    place) get different names, so their vectors are never mixed.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+    return f"local:{digest.hexdigest()[:16]}"
+
+
+class EmbeddingProvider(Embeddings):
+    """
+    Embedding backend shared by indexing and retrieval.
+
+    On top of the LangChain Embeddings methods, a provider has a `name`
+    identifying its vector space (it is part of the embedding cache keys and
+    of the page hashes, so switching providers never mixes vectors) and
+    `aembed_queries` for embedding a batch of search queries in one call.
+    """
+    name: str
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        return list(await asyncio.gather(*(self.aembed_query(t) for t in texts)))
+
+    def shutdown(self):
+        """Release local resources (thread pools); nothing to do for remote APIs."""
+
+
+class GeminiEmbeddings(EmbeddingProvider):
+    """Google Gemini embeddings API (one network round-trip per call)."""
+
+    def __init__(self):
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        self.name = settings.embedding_model
+        self.client = GoogleGenerativeAIEmbeddings(
+            model=settings.embedding_model,
+            google_api_key=settings.gemini_api_key
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.client.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.client.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.client.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.client.aembed_query(text)
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        # Same task type aembed_query uses, so vectors match the single-query path
+        return await self.client.aembed_documents(texts, task_type="RETRIEVAL_QUERY")
+
+
+class LocalEmbeddings(EmbeddingProvider):
+    """
+    Base for models that run in-process on the CPU.
+
+    Texts are encoded in batches of `embedding_local_batch_size` as one
+    vectorised call each. The async methods run the encoding on a small
+    thread pool (`embedding_local_threads`), so inference never blocks the
+    event loop and NumPy / ONNX Runtime can use the cores in parallel.
+    Subclasses implement `_encode`, returning L2-normalised float32 rows
+    (Embeddings is an ABC, so an incomplete subclass cannot be instantiated).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.batch_size = max(1, settings.embedding_local_batch_size)
+        self.query_prefix = settings.embedding_query_prefix
+        self.document_prefix = settings.embedding_document_prefix
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.embedding_local_threads),
+            thread_name_prefix="embedding"
+        )
+
+    @abstractmethod
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode one batch of texts."""
+
+    def _embed(self, texts: List[str], prefix: str) -> List[List[float]]:
+        if prefix:
+            texts = [prefix + text for text in texts]
+        batches = [self._encode(texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)]
+        return np.concatenate(batches).tolist() if batches else []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, self.document_prefix)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], self.query_prefix)[0]
+
+    async def _run(self, texts: List[str], prefix: str) -> List[List[float]]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._embed, texts, prefix)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._run(texts, self.document_prefix)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self._run([text], self.query_prefix))[0]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        return await self._run(texts, self.query_prefix)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+@lru_cache(maxsize=65536)
+def _hash_token(token: str, dim: int) -> Tuple[int, float]:
+    digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if digest >> 63 else -1.0
+
+
+class HashingEmbeddings(LocalEmbeddings):
+    """
+    Deterministic feature-hashing embedder: no model, no network.
+
+    Words and word bigrams are hashed (stable across processes, unlike
+    Python's hash()) into signed buckets, weighted by log term frequency and
+    normalised. Texts sharing words get similar vectors, which is enough for
+    tests, benchmarks and offline smoke runs, not for real retrieval quality.
+    """
+
+    def __init__(self, dim: int):
+        super().__init__(f"hashing-{dim}")
+        self.dim = dim
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _tokens(text)
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            if not features:
+                continue
+            hashed = np.array([_hash_token(f, self.dim) for f in features], dtype=np.float32)
+            buckets = hashed[:, 0].astype(np.int64)
+            # Signed counts per bucket, then dampen repeated terms
+            counts = np.bincount(buckets, weights=hashed[:, 1], minlength=self.dim)
+            vectors[row] = np.sign(counts) * np.log1p(np.abs(counts))
+        return _normalize(vectors)
+
+
+class StaticEmbeddings(LocalEmbeddings):
+    """
+    Static word-vector model in NumPy: the mean of the vectors of a text's words.
+
+    Loaded from `model.npz` with a `vocab` array of (lower-case) words and a
+    `vectors` matrix with one row per word. Unknown words are ignored. A
+    whole batch is pooled with a single gather and reduceat.
+    """
+
+    def __init__(self, path: str):
+        model_file = os.path.join(path, "model.npz")
+        super().__init__(_model_name(model_file))
+        with np.load(model_file) as model:
+            self.vectors = np.ascontiguousarray(model["vectors"], dtype=np.float32)
+            self.vocab = {str(word): i for i, word in enumerate(model["vocab"])}
+        self.dim = self.vectors.shape[1]
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        ids = [[self.vocab[w] for w in _tokens(text) if w in self.vocab] for text in texts]
+        lengths = np.array([len(row) for row in ids])
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        rows = np.flatnonzero(lengths)
+        if len(rows):
+            flat = np.fromiter((i for row in ids for i in row), dtype=np.int64, count=int(lengths.sum()))
+            offsets = np.concatenate(([0], np.cumsum(lengths[rows])[:-1]))
+            vectors[rows] = np.add.reduceat(self.vectors[flat], offsets) / lengths[rows, None]
+        return _normalize(vectors)
+
+
+class OnnxEmbeddings(LocalEmbeddings):
+    """
+    Transformer sentence-embedding model exported to ONNX (e.g. a MiniLM or E5).
+
+    Loaded from `model.onnx` and a Hugging Face `tokenizer.json`. Each batch
+    is padded to its longest text (at most `embedding_max_length` tokens),
+    run through ONNX Runtime and mean-pooled over the attention mask.
+    Requires the optional `onnxruntime` and `tokenizers` packages.
+    """
+
+    def __init__(self, path: str):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError(
+                "The ONNX embedding backend needs `pip install onnxruntime tokenizers`"
+            ) from e
+
+        tokenizer_file = os.path.join(path, "tokenizer.json")
+        model_file = os.path.join(path, "model.onnx")
+        super().__init__(_model_name(model_file, tokenizer_file))
+        self.tokenizer = Tokenizer.from_file(tokenizer_file)
+        self.tokenizer.enable_truncation(max_length=settings.embedding_max_length)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        # Split the cores between the batches the thread pool runs at once
+        options.intra_op_num_threads = max(1, (os.cpu_count() or 1) // max(1, settings.embedding_local_threads))
+        self.session = onnxruntime.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+        }
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        output = self.session.run(None, feeds)[0]
+        if output.ndim == 3:
+            # Token embeddings: average the real (unpadded) tokens
+            weights = mask[:, :, None].astype(np.float32)
+            output = (output * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1.0)
+        return _normalize(np.ascontiguousarray(output, dtype=np.float32))
+
+
+def load_local_model(path: str) -> LocalEmbeddings:
+    """Pick the local backend from the files in `path`: model.onnx, else model.npz."""
+    if not path or not os.path.isdir(path):
+        raise ValueError(f"embedding_model_path is not a directory: {path!r}")
+    if os.path.exists(os.path.join(path, "model.onnx")):
+        return OnnxEmbeddings(path)
+    if os.path.exists(os.path.join(path, "model.npz")):
+        return StaticEmbeddings(path)
+    raise ValueError(f"No model.onnx or model.npz in {path}")
+
+
+def create_embedding_provider() -> EmbeddingProvider:
+    """The provider selected by `embedding_provider` ("gemini", "local" or "hashing")."""
+    provider = settings.embedding_provider.lower()
+    if provider == "gemini":
+        return GeminiEmbeddings()
+    if provider == "local":
+        return load_local_model(settings.embedding_model_path)
+    if provider == "hashing":
+        return HashingEmbeddings(settings.embedding_dim)
+    raise ValueError(f"Unknown embedding_provider: {provider!r} (expected gemini, local or hashing)")
+
+
+# Singleton instance
+embedding_provider = create_embedding_provider()
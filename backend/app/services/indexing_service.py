@@ -1,71 +1,445 @@
-import os
+import asyncio
+import math
+import multiprocessing
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_qdrant import QdrantVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from langchain_core.documents import Document as LCDocument
+from qdrant_client import models
 
 from app.config import settings
+from app.services.embedding_cache import embedding_cache
+from app.services.embedding_pipeline import AdaptiveBatchEmbedder
+from app.services.embeddings import embedding_provider
+from app.services.pdf_parsing import count_pages, parse_page_range
+from app.services.telemetry import telemetry
+from app.services.vector_store import qdrant_connection
+
+# Fixed namespace: a chunk's point id depends only on (document, page, chunk index)
+POINT_ID_NAMESPACE = uuid.UUID("6f1c3e5a-2b8d-4c7e-9a41-d3f0b2e8c915")
+
+
+def point_id(document_key, page: int, chunk_index: int) -> str:
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{document_key}:{page}:{chunk_index}"))
+
+
+@dataclass
+class IndexingProgress:
+    """Live counters for a single indexing run, updated as each stage advances."""
+    pages_parsed: int = 0
+    pages_skipped: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    chunks_upserted: int = 0
+
+
+@dataclass
+class PageState:
+    """Content hash and chunk count of one indexed page."""
+    content_hash: str
+    num_chunks: int
+
+
+@dataclass
+class IndexingResult:
+    num_chunks: int  # chunks of the whole document, unchanged pages included
+    pages: Dict[int, PageState]
+
 
 class IndexingService:
     """
     Service dedicated to indexing documents (mirrors index.py).
     
     This service handles:
-    1. Loading PDF files using PyPDFLoader
+    1. Loading PDF files with pypdf, page-parallel across a process pool
     2. Splitting text into chunks using RecursiveCharacterTextSplitter
-    3. Generating embeddings using Google Gemini
+    3. Generating embeddings with the configured provider, in adaptive concurrent batches
+       (chunks already in the persistent embedding cache are not re-embedded)
     4. Indexing vectors into Qdrant
+    
+    The pipeline is streamed: page ranges are parsed a bounded window at a
+    time, chunks are grouped into fixed-size batches, and each batch is
+    embedded and upserted in order, with up to `embedding_concurrency`
+    batches embedding while the previous batch is being upserted. Peak
+    memory therefore depends on the window and batch sizes, not on the
+    document length.
+    CPU-bound stages run in worker processes and Qdrant is written through
+    the shared async client, so the event loop stays free for chat traffic.
+    Up to `indexing_workers` documents run this pipeline at once and share
+    the parse pool, the embedder's concurrency limit and
+    `indexing_upsert_concurrency`, so while one file is parsing another is
+    embedding or upserting, and each stage stays bounded however many
+    files are queued.
     """
     
     def __init__(self):
         """Initialize embeddings, text splitter, and Qdrant settings."""
-        # Initialize Embeddings
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model=settings.embedding_model,
-            google_api_key=settings.gemini_api_key
-        )
+        # Embedding provider selected in Settings, shared with retrieval
+        self.embeddings = embedding_provider
         
-        # Text Splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=300
-        )
+        # Text Splitter settings (the splitter itself runs in the parse workers)
+        self.chunk_size = settings.chunk_size
+        self.chunk_overlap = settings.chunk_overlap
+        # Part of every page hash: changing these re-indexes all pages
+        self.fingerprint = f"{self.embeddings.name}:{self.chunk_size}:{self.chunk_overlap}"
         
-        self.qdrant_url = settings.qdrant_url
         self.collection_name = "pdf_rag_collection"
+        self._collection_ready = False
+        
+        # PDF parse pool, created lazily on first use
+        self.parse_workers = max(1, settings.pdf_parse_workers)
+        self.max_pages_per_task = max(1, settings.pdf_max_pages_per_task)
+        self._parse_executor: Optional[ProcessPoolExecutor] = None
+        
+        # Streaming bounds: page ranges in flight and embedding batches in flight
+        self.parse_window = max(1, settings.pdf_parse_window)
+        self.embedder = AdaptiveBatchEmbedder(self.embeddings)
+        # Shared by every document being indexed, like the parse pool and the embedder
+        self._upsert_semaphore = asyncio.Semaphore(max(1, settings.indexing_upsert_concurrency))
+
+    def _get_parse_executor(self) -> ProcessPoolExecutor:
+        if self._parse_executor is None:
+            # spawn avoids forking a process that already runs the event loop and its threads
+            self._parse_executor = ProcessPoolExecutor(
+                max_workers=self.parse_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._parse_executor
 
-    async def index_file(self, file_path: str) -> int:
+    def shutdown(self):
+        """Stop the parse worker processes."""
+        if self._parse_executor is not None:
+            self._parse_executor.shutdown(wait=False, cancel_futures=True)
+            self._parse_executor = None
+
+    def _page_ranges(self, num_pages: int) -> List[tuple]:
+        """Split pages into one contiguous range per worker, capped for progress granularity."""
+        per_task = min(math.ceil(num_pages / self.parse_workers), self.max_pages_per_task)
+        per_task = max(per_task, 1)
+        return [(start, min(start + per_task, num_pages)) for start in range(0, num_pages, per_task)]
+
+    async def iter_chunks(
+        self,
+        file_path: str,
+        progress: Optional[IndexingProgress] = None
+    ) -> AsyncIterator[LCDocument]:
         """
-        Load PDF -> Split -> Index in Qdrant.
+        Lazily extract and split a PDF across the parse pool, yielding chunks in page order.
+        
+        At most `parse_window` page ranges are in flight at once; the next range
+        is only submitted once the oldest one has been consumed.
         
         Args:
-            file_path: Absolute path to the PDF file.
-            
-        Returns:
-            int: Number of chunks indexed.
+            file_path: Path to the PDF file.
+            progress: Optional counters; pages_parsed advances as ranges complete.
         """
-        print(f"Loading PDF: {file_path}")
-        loader = PyPDFLoader(file_path)
-        docs = loader.load()
+        progress = progress or IndexingProgress()
+        loop = asyncio.get_running_loop()
+        executor = self._get_parse_executor()
         
-        print(f"Splitting {len(docs)} pages...")
-        chunks = self.text_splitter.split_documents(docs)
+        num_pages = await loop.run_in_executor(executor, count_pages, file_path)
+        ranges = iter(self._page_ranges(num_pages))
+        in_flight = deque()
         
-        # Add metadata
-        filename = Path(file_path).name
-        for chunk in chunks:
-            chunk.metadata["source"] = filename
-            
-        print(f"Indexing {len(chunks)} chunks to Qdrant...")
-        QdrantVectorStore.from_documents(
-            documents=chunks,
-            embedding=self.embeddings,
-            url=self.qdrant_url,
-            collection_name=self.collection_name
+        def submit_next() -> bool:
+            page_range = next(ranges, None)
+            if page_range is None:
+                return False
+            start, end = page_range
+            future = loop.run_in_executor(
+                executor, parse_page_range,
+                file_path, start, end, self.chunk_size, self.chunk_overlap, self.fingerprint
+            )
+            in_flight.append((end - start, future))
+            return True
+        
+        while len(in_flight) < self.parse_window and submit_next():
+            pass
+        
+        try:
+            while in_flight:
+                num_range_pages, future = in_flight.popleft()
+                with telemetry.stage("index_parse"):
+                    chunks = await future
+                submit_next()
+                progress.pages_parsed += num_range_pages
+                for chunk in chunks:
+                    yield chunk
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+
+    async def parse_file(self, file_path: str, progress: Optional[IndexingProgress] = None) -> List[LCDocument]:
+        """Extract and split a whole PDF into a list of chunks (materialises everything)."""
+        return [chunk async for chunk in self.iter_chunks(file_path, progress=progress)]
+
+    async def _iter_batches(self, chunks: AsyncIterator[LCDocument]) -> AsyncIterator[List[LCDocument]]:
+        """Group a chunk stream into batches sized by the embedder's current adaptive batch size."""
+        batch: List[LCDocument] = []
+        async for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= self.embedder.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def _ensure_collection(self, vector_size: int):
+        """Bootstrap the collection on first use, sized from the first embedded batch."""
+        await qdrant_connection.ensure_collection(self.collection_name, vector_size)
+
+    async def tag_untagged_points(self, sources: Dict[str, int]) -> int:
+        """
+        Store `document_id` on chunks indexed before it was part of the payload.
+
+        Args:
+            sources: Stored filename (`metadata.source`) -> Document id.
+
+        Returns:
+            int: Number of documents whose chunks were updated.
+        """
+        client = qdrant_connection.client
+        if not await client.collection_exists(self.collection_name):
+            return 0
+        untagged = models.IsEmptyCondition(is_empty=models.PayloadField(key="metadata.document_id"))
+        result = await client.count(
+            collection_name=self.collection_name,
+            count_filter=models.Filter(must=[untagged]),
+            exact=True
+        )
+        if result.count == 0:
+            return 0
+
+        tagged = 0
+        for source, document_id in sources.items():
+            await client.set_payload(
+                collection_name=self.collection_name,
+                payload={"document_id": document_id},
+                key="metadata",
+                points=models.Filter(must=[
+                    untagged,
+                    models.FieldCondition(key="metadata.source", match=models.MatchValue(value=source))
+                ])
+            )
+            tagged += 1
+        return tagged
+
+    async def delete_document(self, document_id: int, source: Optional[str] = None):
+        """Remove every chunk of a document (matched by id, or by stored filename for untagged chunks)."""
+        client = qdrant_connection.client
+        if not await client.collection_exists(self.collection_name):
+            return
+        conditions = [models.FieldCondition(key="metadata.document_id", match=models.MatchValue(value=document_id))]
+        if source:
+            conditions.append(models.FieldCondition(key="metadata.source", match=models.MatchValue(value=source)))
+        await client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.FilterSelector(filter=models.Filter(should=conditions))
+        )
+
+    async def _delete_stale_points(
+        self,
+        document_id: int,
+        previous_pages: Dict[int, PageState],
+        pages: Dict[int, PageState],
+        finished: bool
+    ):
+        """
+        Delete chunks the new version no longer has.
+
+        For each of `pages` that now splits into fewer chunks, its tail is
+        deleted. Once the run has `finished`, `pages` is the whole document,
+        so pages that are gone and chunks indexed with random ids (before
+        point ids were deterministic) are deleted too.
+        """
+        stale = []
+        for page, previous in previous_pages.items():
+            if page not in pages and not finished:
+                continue  # not reached yet
+            kept = pages[page].num_chunks if page in pages else 0
+            if kept < previous.num_chunks:
+                stale.append(models.Filter(must=[
+                    models.FieldCondition(key="metadata.page", match=models.MatchValue(value=page)),
+                    models.FieldCondition(key="metadata.chunk_index", range=models.Range(gte=kept))
+                ]))
+        if finished:
+            stale.append(models.IsEmptyCondition(is_empty=models.PayloadField(key="metadata.chunk_index")))
+        client = qdrant_connection.client
+        if not stale or not await client.collection_exists(self.collection_name):
+            return
+        await client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.FilterSelector(filter=models.Filter(
+                must=[models.FieldCondition(key="metadata.document_id", match=models.MatchValue(value=document_id))],
+                should=stale
+            ))
         )
-        print("Indexing done!")
-        return len(chunks)
+
+    async def _upsert_batch(self, batch: List[LCDocument], vectors: List[List[float]]):
+        # Payload layout matches langchain_qdrant so retrieval can read it back.
+        # Ids are deterministic, so re-indexing a page overwrites its chunks.
+        points = [
+            models.PointStruct(
+                id=point_id(
+                    chunk.metadata["document_id"] if chunk.metadata["document_id"] is not None
+                    else chunk.metadata["source"],
+                    chunk.metadata["page"],
+                    chunk.metadata["chunk_index"]
+                ),
+                vector=vector,
+                payload={"page_content": chunk.page_content, "metadata": chunk.metadata}
+            )
+            for chunk, vector in zip(batch, vectors)
+        ]
+        async with self._upsert_semaphore:
+            with telemetry.stage("index_upsert"):
+                await qdrant_connection.client.upsert(collection_name=self.collection_name, points=points)
+
+    async def _upsert(self, batch: List[LCDocument], vectors: List[List[float]], progress: IndexingProgress):
+        if not self._collection_ready:
+            await self._ensure_collection(len(vectors[0]))
+            self._collection_ready = True
+        await self._upsert_batch(batch, vectors)
+        progress.chunks_upserted += len(batch)
+
+    async def _embed(self, batch: List[LCDocument], progress: IndexingProgress) -> List[List[float]]:
+        with telemetry.stage("index_embed"):
+            vectors = await embedding_cache.get_or_embed(
+                f"{self.embeddings.name}:document",
+                [c.page_content for c in batch],
+                self.embedder.embed
+            )
+        progress.chunks_embedded += len(batch)
+        return vectors
+
+    async def _changed_chunks(
+        self,
+        chunks: AsyncIterator[LCDocument],
+        previous_pages: Dict[int, PageState],
+        pages: Dict[int, PageState],
+        progress: IndexingProgress
+    ) -> AsyncIterator[LCDocument]:
+        """Record each page's hash and chunk count, passing on only chunks of pages that changed."""
+        async for chunk in chunks:
+            page = chunk.metadata["page"]
+            page_hash = chunk.metadata.pop("page_hash")
+            unchanged = page in previous_pages and previous_pages[page].content_hash == page_hash
+            if page not in pages:
+                pages[page] = PageState(content_hash=page_hash, num_chunks=0)
+                if unchanged:
+                    progress.pages_skipped += 1
+            pages[page].num_chunks += 1
+            if not unchanged:
+                yield chunk
+
+    async def index_file(
+        self,
+        file_path: str,
+        progress: Optional[IndexingProgress] = None,
+        document_id: Optional[int] = None,
+        previous_pages: Optional[Dict[int, PageState]] = None,
+        checkpoint: Optional[Callable[[Dict[int, PageState], int], Awaitable[None]]] = None
+    ) -> IndexingResult:
+        """
+        Stream PDF -> Split -> Embed -> Index in Qdrant, pipelined batch by batch.
+
+        Batches are embedded concurrently (bounded by the embedder) while
+        completed batches are upserted in order, so the upsert of batch N
+        overlaps with embedding batch N+1.
+
+        When re-indexing, pages whose hash matches `previous_pages` are not
+        embedded again. Changed pages overwrite their chunks in place
+        (point ids come from document, page and chunk index), and chunks
+        the new version no longer has are deleted afterwards.
+
+        After each upserted batch, the pages it completed are handed to
+        `checkpoint` (with the first page not yet complete), so an
+        interrupted run can be resumed by passing the checkpointed pages
+        back in as `previous_pages`.
+
+        Args:
+            file_path: Absolute path to the PDF file.
+            progress: Optional counters to update as the run advances.
+            document_id: Document row id stored on every chunk for filtering.
+            previous_pages: Page states saved by the last run (or its checkpoints).
+            checkpoint: Optional async callback(completed_pages, next_page).
+
+        Returns:
+            IndexingResult: Chunk count and the page states to save.
+        """
+        progress = progress or IndexingProgress()
+        previous_pages = previous_pages or {}
+        pages: Dict[int, PageState] = {}
+        filename = Path(file_path).name
+        pending = deque()
+        checkpointed_through = 0
+
+        async def upsert(batch: List[LCDocument], vectors: List[List[float]]):
+            nonlocal checkpointed_through
+            await self._upsert(batch, vectors, progress)
+            # Chunks arrive in page order: every page before this batch's last one is complete
+            next_page = batch[-1].metadata["page"]
+            completed = {
+                page: pages[page] for page in range(checkpointed_through, next_page)
+                if page in pages and pages[page] != previous_pages.get(page)
+            }
+            checkpointed_through = max(checkpointed_through, next_page)
+            if not completed:
+                return
+            if document_id is not None:
+                await self._delete_stale_points(document_id, previous_pages, completed, finished=False)
+            if checkpoint is not None:
+                await checkpoint(completed, next_page)
+
+        print(f"Indexing PDF: {file_path}")
+        try:
+            chunks = self._changed_chunks(
+                self.iter_chunks(file_path, progress=progress), previous_pages, pages, progress
+            )
+            async for batch in self._iter_batches(chunks):
+                for chunk in batch:
+                    chunk.metadata["source"] = filename
+                    chunk.metadata["document_id"] = document_id
+                progress.chunks_total += len(batch)
+
+                pending.append((batch, asyncio.create_task(self._embed(batch, progress))))
+                # Upsert finished batches in order once the embedding window is full
+                while len(pending) > self.embedder.max_concurrency:
+                    done_batch, task = pending.popleft()
+                    await upsert(done_batch, await task)
+
+            while pending:
+                done_batch, task = pending.popleft()
+                await upsert(done_batch, await task)
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+        if document_id is not None:
+            await self._delete_stale_points(document_id, previous_pages, pages, finished=True)
+            if progress.pages_skipped:
+                # Skipped chunks still carry the previous version's stored filename
+                await qdrant_connection.client.set_payload(
+                    collection_name=self.collection_name,
+                    payload={"source": filename},
+                    key="metadata",
+                    points=models.Filter(
+                        must=[models.FieldCondition(
+                            key="metadata.document_id", match=models.MatchValue(value=document_id)
+                        )],
+                        must_not=[models.FieldCondition(
+                            key="metadata.source", match=models.MatchValue(value=filename)
+                        )]
+                    )
+                )
+
+        num_chunks = sum(state.num_chunks for state in pages.values())
+        print(f"Indexing done! {progress.chunks_upserted} chunks upserted from {progress.pages_parsed} pages "
+              f"({progress.pages_skipped} unchanged pages skipped)")
+        return IndexingResult(num_chunks=num_chunks, pages=pages)
 
 # Singleton instance
 indexing_service = IndexingService()
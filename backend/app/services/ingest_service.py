@@ -0,0 +1,174 @@
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+import aiofiles.os
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.models import Document
+from app.services.job_service import indexing_job_queue, IndexingJob
+from app.services.storage import SavedUpload, discard_uploads, stored_path
+
+
+@dataclass
+class IngestItem:
+    """Outcome of one file of a bulk ingest."""
+    filename: str
+    document_id: Optional[int] = None
+    duplicate: bool = False  # same content as an already indexed (or indexing) document
+    error: Optional[str] = None  # why the file was rejected
+
+
+@dataclass
+class IngestProgress:
+    """Aggregate counters over all indexing jobs of a batch."""
+    files: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+    queued: int = 0
+    running: int = 0
+    done: int = 0
+    failed: int = 0
+    pages_parsed: int = 0
+    pages_skipped: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    chunks_upserted: int = 0
+
+
+@dataclass
+class IngestBatch:
+    """A set of files ingested together, tracked through their indexing jobs."""
+    id: str
+    items: List[IngestItem]
+    jobs: List[IndexingJob] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def status(self) -> str:
+        return "indexing" if any(job.status in ("queued", "running") for job in self.jobs) else "done"
+
+    def progress(self) -> IngestProgress:
+        progress = IngestProgress(
+            files=len(self.items),
+            duplicates=sum(item.duplicate for item in self.items),
+            rejected=sum(item.error is not None for item in self.items)
+        )
+        for job in self.jobs:
+            if job.status == "error":
+                progress.failed += 1
+            else:
+                setattr(progress, job.status, getattr(progress, job.status) + 1)
+            progress.pages_parsed += job.progress.pages_parsed
+            progress.pages_skipped += job.progress.pages_skipped
+            progress.chunks_total += job.progress.chunks_total
+            progress.chunks_embedded += job.progress.chunks_embedded
+            progress.chunks_upserted += job.progress.chunks_upserted
+        return progress
+
+
+class IngestService:
+    """
+    Registers uploaded files as documents and queues them for indexing.
+
+    Shared by the single upload endpoint, the bulk endpoint and the CLI.
+    Files are deduplicated by content hash, against the database and within
+    the batch itself. The indexing work is not done here: every new document
+    becomes one job of the indexing queue, whose stages (workers, parse
+    pool, embedding and upsert limits) bound the parallelism.
+    """
+
+    def __init__(self):
+        self.max_history = settings.indexing_job_history
+        self._batches: "OrderedDict[str, IngestBatch]" = OrderedDict()
+
+    async def register(self, db: AsyncSession, upload: SavedUpload) -> Tuple[Document, bool]:
+        """
+        Move a received file into place and create (or reuse) its document row.
+
+        Returns (document, duplicate). A duplicate is a file whose document
+        is already indexed or indexing; its temporary file is removed and
+        nothing needs to be queued. Otherwise the document is left in
+        'indexing' status and the caller submits its file, which is stored
+        at `stored_path(doc.filename, doc.file_hash)`.
+        """
+        file_hash = upload.file_hash
+        result = await db.execute(select(Document).where(Document.file_hash == file_hash))
+        doc = result.scalar_one_or_none()
+        if doc and doc.status in ("indexed", "indexing"):
+            await aiofiles.os.remove(upload.temp_path)
+            return doc, True
+
+        if doc:
+            # A previous run failed: index the same row again, with the file where its filename points
+            doc.status = "indexing"
+        else:
+            doc = Document(
+                filename=upload.filename,
+                file_hash=file_hash,
+                status="indexing"
+            )
+            db.add(doc)
+        file_path = stored_path(doc.filename, file_hash)
+        await aiofiles.os.replace(upload.temp_path, file_path)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent upload of the same file: attach to it
+            await db.rollback()
+            result = await db.execute(select(Document).where(Document.file_hash == file_hash))
+            doc = result.scalar_one()
+            if stored_path(doc.filename, file_hash) != file_path:
+                await aiofiles.os.remove(file_path)
+            return doc, True
+        await db.refresh(doc)
+        return doc, False
+
+    async def ingest(
+        self,
+        uploads: Sequence[SavedUpload],
+        rejected: Sequence[Tuple[str, str]] = ()
+    ) -> IngestBatch:
+        """Register every upload and queue the new documents; never fails on a full queue."""
+        items = [IngestItem(filename=name, error=reason) for name, reason in rejected]
+        batch = IngestBatch(id=uuid.uuid4().hex, items=items)
+        to_index: List[Tuple[int, str]] = []
+        try:
+            async with AsyncSessionLocal() as db:
+                for upload in uploads:
+                    doc, duplicate = await self.register(db, upload)
+                    items.append(IngestItem(filename=upload.filename, document_id=doc.id, duplicate=duplicate))
+                    if not duplicate:
+                        to_index.append((doc.id, stored_path(doc.filename, doc.file_hash)))
+                        continue
+                    # Follow a duplicate that is still indexing, unless it is already tracked
+                    job = indexing_job_queue.get_job_for_document(doc.id)
+                    if job and job.status in ("queued", "running") and job not in batch.jobs:
+                        batch.jobs.append(job)
+        except BaseException:
+            # Documents registered before the failure are committed as 'indexing': queue them
+            # anyway, or they would sit there (and count as duplicates) until the next restart
+            indexing_job_queue.submit_many(to_index)
+            await discard_uploads(uploads)
+            raise
+        batch.jobs.extend(indexing_job_queue.submit_many(to_index))
+
+        self._batches[batch.id] = batch
+        while len(self._batches) > self.max_history:
+            self._batches.popitem(last=False)
+        print(f"📦 Ingest batch {batch.id}: {len(to_index)} queued, "
+              f"{len(items) - len(to_index)} duplicate or rejected")
+        return batch
+
+    def get_batch(self, batch_id: str) -> Optional[IngestBatch]:
+        return self._batches.get(batch_id)
+
+
+# Singleton instance
+ingest_service = IngestService()
@@ -0,0 +1,306 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import delete, func, select, update
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.models import Document, DocumentPage
+from app.services.answer_cache import answer_cache
+from app.services.indexing_service import indexing_service, IndexingProgress, PageState
+from app.services.storage import stored_filename, stored_path
+
+
+@dataclass
+class IndexingJob:
+    """A queued or running indexing run for one uploaded document."""
+    id: str
+    document_id: int
+    file_path: str
+    status: str = "queued"  # queued, running, done, error
+    error: Optional[str] = None
+    progress: IndexingProgress = field(default_factory=IndexingProgress)
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+class IndexingJobQueue:
+    """
+    Background queue that runs the indexing pipeline outside the request cycle.
+
+    Uploads enqueue a job and return immediately; a fixed pool of worker
+    tasks drains the queue, so at most `indexing_workers` documents are
+    indexed at the same time regardless of how many are uploaded.
+    """
+
+    def __init__(self):
+        self.num_workers = settings.indexing_workers
+        self.max_queued = settings.indexing_queue_size
+        self.max_history = settings.indexing_job_history
+        self.resume_on_startup = settings.indexing_resume_on_startup
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._feeders: Set[asyncio.Task] = set()
+        self._jobs: "OrderedDict[str, IndexingJob]" = OrderedDict()
+        self._jobs_by_document: Dict[int, str] = {}
+
+    async def start(self):
+        """Spawn the worker pool. Called once from the app lifespan."""
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"indexing-worker-{i}")
+            for i in range(self.num_workers)
+        ]
+        print(f"🧵 Started {self.num_workers} indexing workers")
+
+    async def stop(self):
+        """Cancel the worker pool; queued jobs are dropped."""
+        tasks = self._workers + list(self._feeders)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, document_id: int, file_path: str) -> IndexingJob:
+        """
+        Enqueue a document for indexing.
+
+        Raises:
+            asyncio.QueueFull: If the queue is at capacity.
+        """
+        job = IndexingJob(id=uuid.uuid4().hex, document_id=document_id, file_path=file_path)
+        self._queue.put_nowait(job)
+        self._jobs[job.id] = job
+        self._jobs_by_document[document_id] = job.id
+        self._prune_history()
+        return job
+
+    def submit_many(self, documents: List[Tuple[int, str]]) -> List[IndexingJob]:
+        """
+        Enqueue many (document_id, file_path) pairs without failing on a full queue.
+
+        The jobs are registered (status 'queued') right away; a background
+        task feeds them into the bounded queue as workers free up space.
+        """
+        jobs = [
+            IndexingJob(id=uuid.uuid4().hex, document_id=document_id, file_path=file_path)
+            for document_id, file_path in documents
+        ]
+        for job in jobs:
+            self._jobs[job.id] = job
+            self._jobs_by_document[job.document_id] = job.id
+        if jobs:
+            feeder = asyncio.create_task(self._feed(jobs))
+            self._feeders.add(feeder)
+            feeder.add_done_callback(self._feeders.discard)
+        self._prune_history()
+        return jobs
+
+    async def _feed(self, jobs: List[IndexingJob]):
+        for job in jobs:
+            await self._queue.put(job)
+
+    def get_job(self, job_id: str) -> Optional[IndexingJob]:
+        return self._jobs.get(job_id)
+
+    def get_job_for_document(self, document_id: int) -> Optional[IndexingJob]:
+        job_id = self._jobs_by_document.get(document_id)
+        return self._jobs.get(job_id) if job_id else None
+
+    def status_counts(self) -> Dict[str, int]:
+        """Number of known jobs per status (queued, running, done, error)."""
+        counts = {status: 0 for status in ("queued", "running", "done", "error")}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return counts
+
+    def _prune_history(self):
+        """Forget the oldest finished jobs once the history limit is exceeded."""
+        finished = [j for j in self._jobs.values() if j.status in ("done", "error")]
+        excess = len(self._jobs) - self.max_history
+        for job in finished[:max(excess, 0)]:
+            del self._jobs[job.id]
+            if self._jobs_by_document.get(job.document_id) == job.id:
+                del self._jobs_by_document[job.document_id]
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except Exception as e:
+                # Never let a single bad job take a worker down with it
+                print(f"❌ Indexing worker {worker_id} error on job {job.id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: IndexingJob):
+        job.status = "running"
+        job.started_at = time.time()
+        print(f"📥 Indexing job {job.id} started (document {job.document_id})")
+
+        try:
+            result = await indexing_service.index_file(
+                job.file_path,
+                progress=job.progress,
+                document_id=job.document_id,
+                previous_pages=await self._load_pages(job.document_id),
+                checkpoint=lambda pages, next_page: self._save_checkpoint(job, pages, next_page)
+            )
+            await self._set_document_status(
+                job.document_id,
+                status="indexed",
+                pages=result.pages,
+                num_pages=job.progress.pages_parsed,
+                num_chunks=result.num_chunks,
+                checkpoint_page=None,
+                checkpoint_chunks=None,
+                checkpoint_at=None
+            )
+            job.status = "done"
+            # Cached answers were generated against the previous corpus
+            answer_cache.bump_corpus_version()
+            print(f"✅ Indexing job {job.id} finished ({result.num_chunks} chunks, "
+                  f"{job.progress.pages_skipped} unchanged pages skipped)")
+        except Exception as e:
+            job.status = "error"
+            job.error = str(e)
+            print(f"❌ Indexing job {job.id} failed: {e}")
+            await self._set_document_status(job.document_id, status="error")
+        finally:
+            job.finished_at = time.time()
+
+    async def backfill_document_ids(self):
+        """Tag chunks of documents indexed before `document_id` was stored in Qdrant."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Document.id, Document.filename, Document.file_hash)
+                .where(Document.status == "indexed")
+            )
+            sources = {
+                stored_filename(filename, file_hash): document_id
+                for document_id, filename, file_hash in result.all()
+            }
+        if not sources:
+            return
+        try:
+            tagged = await indexing_service.tag_untagged_points(sources)
+        except Exception as e:
+            # Filtering by document id just misses those chunks until the next start
+            print(f"⚠️ Could not tag existing chunks with document ids: {e}")
+            return
+        if tagged:
+            print(f"🏷️ Tagged chunks of {tagged} documents with their document id")
+
+    async def recover(self):
+        """
+        Resume documents a previous process left in 'indexing'.
+
+        Jobs only live in memory, so at startup any document still marked
+        'indexing' was interrupted. If its PDF is still on disk it is queued
+        again and resumes after its last checkpoint (pages saved in
+        document_pages are not embedded again). Otherwise, or with
+        `indexing_resume_on_startup` off, its vectors are deleted and it is
+        marked 'error' so it can be uploaded again.
+        """
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Document.id, Document.filename, Document.file_hash, Document.checkpoint_page)
+                .where(Document.status == "indexing")
+            )
+            interrupted = result.all()
+
+        resumable = []
+        for document_id, filename, file_hash, checkpoint_page in interrupted:
+            file_path = stored_path(filename, file_hash)
+            if self.resume_on_startup and os.path.exists(file_path):
+                resumable.append((document_id, file_path))
+                print(f"♻️ Resuming indexing of document {document_id} from page {checkpoint_page or 0}")
+            else:
+                await self._discard(document_id, stored_filename(filename, file_hash))
+        # More documents than the queue holds are fed in as workers free up, never dropped
+        self.submit_many(resumable)
+
+    async def _discard(self, document_id: int, source: str):
+        """Delete an unfinished document's vectors and page states and mark it as failed."""
+        try:
+            await indexing_service.delete_document(document_id, source=source)
+        except Exception as e:
+            print(f"❌ Could not delete vectors of document {document_id}: {e}")
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(DocumentPage).where(DocumentPage.document_id == document_id))
+            await db.execute(
+                update(Document).where(Document.id == document_id)
+                .values(status="error", checkpoint_page=None, checkpoint_chunks=None, checkpoint_at=None)
+            )
+            await db.commit()
+        print(f"🧹 Cleaned up unfinished document {document_id}")
+
+    async def _save_checkpoint(self, job: IndexingJob, pages: Dict[int, PageState], next_page: int):
+        """Commit the pages completed by the last batch together with the run's position."""
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                delete(DocumentPage)
+                .where(DocumentPage.document_id == job.document_id, DocumentPage.page.in_(list(pages)))
+            )
+            db.add_all(self._page_rows(job.document_id, pages))
+            await db.execute(
+                update(Document).where(Document.id == job.document_id).values(
+                    checkpoint_page=next_page,
+                    checkpoint_chunks=job.progress.chunks_upserted,
+                    checkpoint_at=func.now()
+                )
+            )
+            await db.commit()
+
+    def _page_rows(self, document_id: int, pages: Dict[int, PageState]) -> List[DocumentPage]:
+        return [
+            DocumentPage(
+                document_id=document_id,
+                page=page,
+                content_hash=state.content_hash,
+                num_chunks=state.num_chunks
+            )
+            for page, state in pages.items()
+        ]
+
+    async def _load_pages(self, document_id: int) -> Dict[int, PageState]:
+        """Page states saved by the document's last run or checkpoints (empty on first indexing)."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(DocumentPage.page, DocumentPage.content_hash, DocumentPage.num_chunks)
+                .where(DocumentPage.document_id == document_id)
+            )
+            return {
+                page: PageState(content_hash=content_hash, num_chunks=num_chunks)
+                for page, content_hash, num_chunks in result.all()
+            }
+
+    async def _set_document_status(
+        self,
+        document_id: int,
+        status: str,
+        pages: Optional[Dict[int, PageState]] = None,
+        **fields
+    ):
+        async with AsyncSessionLocal() as db:
+            doc = await db.get(Document, document_id)
+            if doc is None:
+                return
+            doc.status = status
+            for key, value in fields.items():
+                setattr(doc, key, value)
+            if pages is not None:
+                # Replace the page states in the same transaction as the status
+                await db.execute(delete(DocumentPage).where(DocumentPage.document_id == document_id))
+                db.add_all(self._page_rows(document_id, pages))
+            await db.commit()
+
+
+# Singleton instance
+indexing_job_queue = IndexingJobQueue()
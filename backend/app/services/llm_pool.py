@@ -0,0 +1,62 @@
+import threading
+from typing import Dict, List, Tuple
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from app.config import settings
+
+
+class LLMClientPool:
+    """
+    Registry of chat model clients, one per (model_name, temperature).
+
+    Clients are created lazily on first use and then reused by every request,
+    so their underlying HTTP connections stay warm instead of being set up
+    (TLS handshake included) on each chat turn. Creation is guarded by a lock
+    so concurrent first requests for a model share one client.
+    """
+
+    def __init__(self):
+        self.api_key = settings.gemini_api_key
+        self._clients: Dict[Tuple[str, float], ChatGoogleGenerativeAI] = {}
+        self._lock = threading.Lock()
+
+    def _create(self, model_name: str, temperature: float) -> ChatGoogleGenerativeAI:
+        return ChatGoogleGenerativeAI(
+            model=model_name,
+            google_api_key=self.api_key,
+            temperature=temperature
+        )
+
+    def get(self, model_name: str, temperature: float = None) -> ChatGoogleGenerativeAI:
+        temperature = settings.llm_temperature if temperature is None else temperature
+        key = (model_name, temperature)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._create(model_name, temperature)
+                    self._clients[key] = client
+        return client
+
+    async def warm_up(self, model_names: List[str]):
+        """
+        Create clients for `model_names` ahead of traffic.
+
+        With `llm_warmup_ping` enabled, also send a one-word prompt to each so
+        the connection is established before the first real request.
+        """
+        for model_name in model_names:
+            client = self.get(model_name)
+            if not settings.llm_warmup_ping:
+                continue
+            try:
+                await client.ainvoke("ping")
+                print(f"🔥 Warmed up LLM client: {model_name}")
+            except Exception as e:
+                print(f"⚠️ LLM warm-up failed for {model_name}: {e}")
+
+
+# Singleton instance
+llm_client_pool = LLMClientPool()
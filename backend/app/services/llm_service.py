@@ -1,106 +1,372 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Sequence
+import asyncio
 import time
 
 from app.config import settings
-from app.services.retrieval_service import retrieval_service
-from app.models.models import Metric
+from app.services.answer_cache import answer_cache
+from app.services.cache import normalize_query
+from app.services.context_packer import context_packer
+from app.services.llm_pool import llm_client_pool
+from app.services.retrieval_service import retrieval_service, normalize_document_ids, DocumentIds
+from app.services.singleflight import SingleFlight
+from app.services.telemetry import telemetry
 
 class LLMService:
     """
     Service dedicated to generating answers using the LLM.
-    Orchestrates Retrieval -> Generation -> Metrics Logging.
+    Orchestrates Answer Cache -> Retrieval -> Context Packing -> Generation.
+    Persisting messages and metrics is left to the caller.
     """
-    
+
     def __init__(self):
         self.default_model = settings.gemini_model
-        self.api_key = settings.gemini_api_key
+        # Identical concurrent questions share one retrieval + generation
+        self.inflight = SingleFlight("generation")
+        self.batch_search_size = settings.batch_search_size
+
+    def _build_messages(self, query: str, context_chunks: List[Dict[str, Any]]) -> list:
+        """Construct the system + user prompt from retrieved chunks."""
+        context_str = "\n\n".join([
+            f"Source: {chunk['metadata'].get('source', 'Unknown')} (Page {chunk['metadata'].get('page', 'N/A')})\n"
+            f"Content: {chunk['page_content']}"
+            for chunk in context_chunks
+        ])
+
+        system_prompt = f"""
+        You are a helpful AI Assistant. Answer the user's question based ONLY on the following context.
+        If the answer is not in the context, say "I cannot answer this based on the provided documents."
+
+        Include citations to the source file and page number in your answer (e.g., [Source: file.pdf, Page 2]).
+
+        Context:
+        {context_str}
+        """
+
+        return [
+            ("system", system_prompt),
+            ("user", query)
+        ]
+
+    def _pack_messages(self, query: str, context_chunks: List[Dict[str, Any]], model_name: str):
+        """Pack retrieved chunks into the model's context budget and build the prompt."""
+        with telemetry.stage("prompt"):
+            packed = context_packer.pack(context_chunks, model_name)
+            messages = self._build_messages(query, packed.chunks)
+        telemetry.context_tokens.inc(packed.tokens_after, kind="sent")
+        telemetry.context_tokens.inc(packed.tokens_saved, kind="saved")
+        return messages, packed.tokens_saved
+
+    def _get_llm(self, model_name: str):
+        # Reuse the pooled client for the selected model
+        return llm_client_pool.get(model_name)
 
     async def generate_response(
-        self, 
-        query: str, 
-        session_id: int,
-        db: AsyncSession,
+        self,
+        query: str,
         model_name: str = "gemini-2.5-flash",
         top_k: int = 4,
-        doc_filter: Optional[str] = None
+        doc_filter: Optional[str] = None,
+        document_ids: Optional[Sequence[int]] = None
     ) -> Dict[str, Any]:
         """
         Generate RAG response.
-        
+
         Args:
             query: User question
-            session_id: Current session ID (for metrics)
-            db: Database session (for metrics)
             model_name: LLM model to use
             top_k: Number of chunks to retrieve
             doc_filter: Filename to filter by
-            
+            document_ids: Document ids to restrict retrieval to
+
         Returns:
-            Dict with 'response' and 'context' (list of chunks)
+            Dict with 'response', 'context' (list of chunks), 'cached',
+            'tokens_saved' (context tokens removed by packing) and
+            'latency_ms' (as seen by this caller)
         """
         start_time = time.time()
-        
+
+        # Concurrent identical requests share the answer
+        document_ids = normalize_document_ids(document_ids)
+        key = (normalize_query(query), doc_filter, document_ids, top_k, model_name)
+        result = await self.inflight.do(
+            key, lambda: self._answer(query, model_name, top_k, doc_filter, document_ids)
+        )
+
+        return {**result, "latency_ms": int((time.time() - start_time) * 1000)}
+
+    async def _answer(
+        self,
+        query: str,
+        model_name: str,
+        top_k: int,
+        doc_filter: Optional[str],
+        document_ids: DocumentIds
+    ) -> Dict[str, Any]:
+        """Answer a query without any per-session side effects (safe to share between callers)."""
+        start_time = time.time()
+        # An answer is only cached if no document changed while it was being produced
+        corpus_version = answer_cache.corpus_version
+
+        # 0. Semantically similar question already answered in this scope?
+        query_vector = await retrieval_service.embed_query(query)
+        scope = (doc_filter, document_ids, model_name, top_k)
+        cached = answer_cache.lookup(query_vector, scope)
+        if cached:
+            return {
+                "response": cached.answer,
+                "context": cached.context,
+                "cached": True,
+                "tokens_saved": 0
+            }
+
         # 1. Retrieve Context
         context_chunks = await retrieval_service.search(
             query=query,
             top_k=top_k,
-            doc_filename=doc_filter
+            doc_filename=doc_filter,
+            document_ids=document_ids
         )
-        
-        # 2. Check if context found 
-        if not context_chunks:
-            pass
 
-        # 3. Construct Prompt
-        context_str = "\n\n".join([
-            f"Source: {chunk['metadata'].get('source', 'Unknown')} (Page {chunk['metadata'].get('page', 'N/A')})\n"
-            f"Content: {chunk['page_content']}"
-            for chunk in context_chunks
-        ])
-        
-        system_prompt = f"""
-        You are a helpful AI Assistant. Answer the user's question based ONLY on the following context.
-        If the answer is not in the context, say "I cannot answer this based on the provided documents."
-        
-        Include citations to the source file and page number in your answer (e.g., [Source: file.pdf, Page 2]).
-        
-        Context:
-        {context_str}
+        # 2. Construct Prompt + 3. Call LLM
+        answer, tokens_saved = await self._generate(query, context_chunks, model_name)
+
+        latency_ms = int((time.time() - start_time) * 1000)
+        answer_cache.store(query_vector, scope, answer, context_chunks, latency_ms, corpus_version)
+
+        return {
+            "response": answer,
+            "context": context_chunks,
+            "cached": False,
+            "tokens_saved": tokens_saved
+        }
+
+    async def _generate(self, query: str, context_chunks: List[Dict[str, Any]], model_name: str):
+        """Pack the prompt and call the LLM. Returns (answer, tokens_saved)."""
+        messages, tokens_saved = self._pack_messages(query, context_chunks, model_name)
+        llm = self._get_llm(model_name)
+        with telemetry.stage("llm"):
+            response = await llm.ainvoke(messages)
+        telemetry.record_tokens(model_name, getattr(response, "usage_metadata", None))
+        return response.content, tokens_saved
+
+    async def generate_batch(
+        self,
+        items: List[Dict[str, Any]],
+        model_name: str,
+        concurrency: int
+    ) -> AsyncIterator[Dict[str, Any]]:
         """
-        
-        # 4. Call LLM
-        # Initialize LLM dynamically based on selected model
-        llm = ChatGoogleGenerativeAI(
-            model=model_name,
-            google_api_key=self.api_key,
-            temperature=0.3
-        )
-        
-        messages = [
-            ("system", system_prompt),
-            ("user", query)
+        Answer many queries, yielding each result as soon as it is ready.
+
+        All queries are embedded in batched calls, cache misses are searched
+        with one Qdrant batch request per `batch_search_size` queries, and at
+        most `concurrency` LLM calls run at the same time. Repeats of the same
+        question (same normalised text and scope) are searched and generated
+        once and share the answer, reported as cached.
+
+        Args:
+            items: Dicts with 'query', 'top_k', 'doc_filter' and 'document_ids'.
+            model_name: LLM model to use for every item.
+            concurrency: Maximum concurrent generations.
+
+        Yields:
+            {'index', 'response', 'context', 'cached', 'tokens_saved', 'latency_ms'}
+            per item (latency counted from the start of the batch), or
+            {'index', 'error'} if that item failed. Order is completion order.
+        """
+        start_time = time.time()
+
+        def elapsed_ms() -> int:
+            return int((time.time() - start_time) * 1000)
+
+        corpus_version = answer_cache.corpus_version
+        try:
+            vectors = await retrieval_service.embed_queries([item["query"] for item in items])
+        except Exception as e:
+            # Nothing can be searched without the query vectors: every item fails
+            for index in range(len(items)):
+                yield {"index": index, "error": str(e)}
+            return
+        scopes = [
+            (item["doc_filter"], normalize_document_ids(item["document_ids"]), model_name, item["top_k"])
+            for item in items
         ]
-        
-        response = await llm.ainvoke(messages)
-        answer = response.content
-        
-        # 5. Log Metrics
-        latency_ms = int((time.time() - start_time) * 1000)
-        metric = Metric(
-            session_id=session_id,
+
+        # Identical questions in the same scope are searched and generated once
+        groups: Dict[tuple, List[int]] = {}
+        for index, (vector, scope) in enumerate(zip(vectors, scopes)):
+            cached = answer_cache.lookup(vector, scope)
+            if cached is None:
+                groups.setdefault((normalize_query(items[index]["query"]), scope), []).append(index)
+                continue
+            yield {
+                "index": index,
+                "response": cached.answer,
+                "context": cached.context,
+                "cached": True,
+                "tokens_saved": 0,
+                "latency_ms": elapsed_ms()
+            }
+        pending = list(groups.values())
+
+        contexts = {}  # first index of a group -> retrieved chunks
+        failed = set()
+        for offset in range(0, len(pending), self.batch_search_size):
+            batch = pending[offset:offset + self.batch_search_size]
+            leaders = [members[0] for members in batch]
+            try:
+                results = await retrieval_service.search_batch(
+                    [vectors[i] for i in leaders],
+                    [(items[i]["top_k"], items[i]["doc_filter"], items[i]["document_ids"]) for i in leaders]
+                )
+            except Exception as e:
+                for members in batch:
+                    for index in members:
+                        yield {"index": index, "error": str(e)}
+                failed.update(leaders)
+                continue
+            contexts.update(zip(leaders, results))
+        pending = [members for members in pending if members[0] not in failed]
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def answer_group(members: List[int]) -> List[Dict[str, Any]]:
+            index = members[0]
+            async with semaphore:
+                started = time.time()
+                try:
+                    answer, tokens_saved = await self._generate(items[index]["query"], contexts[index], model_name)
+                except Exception as e:
+                    return [{"index": i, "error": str(e)} for i in members]
+                generation_ms = int((time.time() - started) * 1000)
+                answer_cache.store(
+                    vectors[index], scopes[index], answer, contexts[index], generation_ms, corpus_version
+                )
+                latency_ms = elapsed_ms()
+                return [
+                    {
+                        "index": i,
+                        "response": answer,
+                        "context": contexts[index],
+                        # Repeats of the question reuse the first one's answer
+                        "cached": i != index,
+                        "tokens_saved": tokens_saved if i == index else 0,
+                        "latency_ms": latency_ms
+                    }
+                    for i in members
+                ]
+
+        tasks = [asyncio.create_task(answer_group(members)) for members in pending]
+        try:
+            for next_results in asyncio.as_completed(tasks):
+                for result in await next_results:
+                    yield result
+        finally:
+            # Client went away: stop queued generations
+            for task in tasks:
+                task.cancel()
+
+    async def stream_response(
+        self,
+        query: str,
+        model_name: str = "gemini-2.5-flash",
+        top_k: int = 4,
+        doc_filter: Optional[str] = None,
+        document_ids: Optional[Sequence[int]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate a RAG response as a stream of events.
+
+        Yields, in order:
+            {"event": "context", "data": {"context": [...]}} once retrieval is done,
+            {"event": "token", "data": {"text": "..."}} per model chunk,
+            {"event": "done", "data": {"response": ..., "cached": ..., "chunks_retrieved": ...,
+                                       "tokens_saved": ..., "timing": {...}}} at the end.
+
+        A cached answer is sent as a single token event.
+        Arguments are the same as generate_response.
+        """
+        start_time = time.time()
+        document_ids = normalize_document_ids(document_ids)
+        corpus_version = answer_cache.corpus_version
+
+        query_vector = await retrieval_service.embed_query(query)
+        scope = (doc_filter, document_ids, model_name, top_k)
+        cached = answer_cache.lookup(query_vector, scope)
+        if cached:
+            yield {"event": "context", "data": {"context": cached.context}}
+            yield {"event": "token", "data": {"text": cached.answer}}
+            latency_ms = int((time.time() - start_time) * 1000)
+            yield {
+                "event": "done",
+                "data": {
+                    "response": cached.answer,
+                    "cached": True,
+                    "chunks_retrieved": len(cached.context),
+                    "tokens_saved": 0,
+                    "timing": {"retrieval_ms": 0, "ttft_ms": latency_ms, "total_ms": latency_ms}
+                }
+            }
+            return
+
+        context_chunks = await retrieval_service.search(
             query=query,
-            latency_ms=latency_ms,
-            chunks_retrieved=len(context_chunks),
-            model_used=model_name
+            top_k=top_k,
+            doc_filename=doc_filter,
+            document_ids=document_ids
         )
-        db.add(metric)
-        await db.commit()
-        
-        return {
-            "response": answer,
-            "context": context_chunks
+        retrieval_ms = int((time.time() - start_time) * 1000)
+        yield {"event": "context", "data": {"context": context_chunks}}
+
+        messages, tokens_saved = self._pack_messages(query, context_chunks, model_name)
+        llm = self._get_llm(model_name)
+
+        parts: List[str] = []
+        ttft_ms = None
+        usage = None
+        # Time spent waiting on the model only, not on the consumer of our yields
+        llm_seconds = 0.0
+        mark = time.perf_counter()
+        async for chunk in llm.astream(messages):
+            llm_seconds += time.perf_counter() - mark
+            mark = time.perf_counter()
+            if getattr(chunk, "usage_metadata", None):
+                usage = chunk.usage_metadata if usage is None else {
+                    k: usage.get(k, 0) + chunk.usage_metadata.get(k, 0)
+                    for k in ("input_tokens", "output_tokens")
+                }
+            text = chunk.content if isinstance(chunk.content, str) else "".join(
+                part.get("text", "") if isinstance(part, dict) else str(part) for part in chunk.content
+            )
+            if not text:
+                continue
+            if ttft_ms is None:
+                ttft_ms = int((time.time() - start_time) * 1000)
+                telemetry.ttft_seconds.observe(ttft_ms / 1000)
+            parts.append(text)
+            yield {"event": "token", "data": {"text": text}}
+            mark = time.perf_counter()
+        llm_seconds += time.perf_counter() - mark
+        telemetry.observe_stage("llm", llm_seconds)
+        telemetry.record_tokens(model_name, usage)
+
+        answer = "".join(parts)
+        latency_ms = int((time.time() - start_time) * 1000)
+        answer_cache.store(query_vector, scope, answer, context_chunks, latency_ms, corpus_version)
+
+        yield {
+            "event": "done",
+            "data": {
+                "response": answer,
+                "cached": False,
+                "chunks_retrieved": len(context_chunks),
+                "tokens_saved": tokens_saved,
+                "timing": {
+                    "retrieval_ms": retrieval_ms,
+                    "ttft_ms": ttft_ms,
+                    "total_ms": latency_ms
+                }
+            }
         }
 
 # Singleton instance
@@ -0,0 +1,129 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.models import Metric
+
+# Request timing keys (see telemetry.stage names) -> Metric columns
+STAGE_COLUMNS = {
+    "embed_query": "embed_ms",
+    "search": "search_ms",
+    "prompt": "prompt_ms",
+    "llm": "llm_ms",
+    "db_write": "db_ms",
+    "input_tokens": "input_tokens",
+    "output_tokens": "output_tokens",
+}
+
+
+class MetricsWriter:
+    """
+    Buffers query metrics in memory and writes them in bulk.
+
+    Request handlers call `record()`, which never touches the database. A
+    background task flushes the buffer with one multi-row INSERT whenever
+    `metrics_batch_size` rows are waiting or `metrics_flush_interval`
+    seconds have passed. If the buffer reaches `metrics_queue_size` (the
+    database is down or too slow) new rows are dropped and counted rather
+    than applying back-pressure to chat requests.
+    """
+
+    def __init__(self):
+        self.batch_size = max(1, settings.metrics_batch_size)
+        self.flush_interval = settings.metrics_flush_interval
+        self.max_buffered = settings.metrics_queue_size
+        self.persist_stages = settings.metrics_persist_stages
+        self._buffer: List[Dict[str, Any]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Stats
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.errors = 0
+
+    async def start(self):
+        """Start the flush loop. Called once from the app lifespan."""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="metrics-writer")
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def record(
+        self,
+        session_id: int,
+        query: str,
+        latency_ms: int,
+        chunks_retrieved: int,
+        model_name: str,
+        stage_timings: Optional[Dict[str, float]] = None
+    ):
+        """Queue one metric row for the next flush."""
+        if len(self._buffer) >= self.max_buffered:
+            self.dropped += 1
+            return
+        row = {
+            "session_id": session_id,
+            "query": query,
+            "latency_ms": latency_ms,
+            "chunks_retrieved": chunks_retrieved,
+            "model_used": model_name
+        }
+        if self.persist_stages:
+            # Every row needs the same keys for a single multi-row INSERT
+            timings = stage_timings or {}
+            for key, column in STAGE_COLUMNS.items():
+                value = timings.get(key)
+                row[column] = int(value) if value is not None else None
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        while self._buffer:
+            rows = self._buffer[:self.batch_size]
+            del self._buffer[:self.batch_size]
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(insert(Metric), rows)
+                    await db.commit()
+            except Exception as e:
+                # Metrics are best-effort; never let them take the writer down
+                self.errors += 1
+                self.dropped += len(rows)
+                print(f"❌ Failed to write {len(rows)} metrics: {e}")
+                return
+            self.written += len(rows)
+            self.flushes += 1
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "errors": self.errors,
+        }
+
+
+# Singleton instance
+metrics_writer = MetricsWriter()
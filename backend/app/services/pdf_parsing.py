@@ -0,0 +1,64 @@
+"""
+CPU-bound PDF parsing helpers.
+
+These functions run inside worker processes of the indexing process pool,
+so they are kept at module level (picklable) and only import pypdf and the
+text splitter; importing this module must stay cheap.
+"""
+
+import hashlib
+from typing import List
+
+from pypdf import PdfReader
+from langchain_core.documents import Document as LCDocument
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+def count_pages(file_path: str) -> int:
+    """Return the number of pages in a PDF."""
+    return len(PdfReader(file_path).pages)
+
+
+def parse_page_range(
+    file_path: str,
+    start: int,
+    end: int,
+    chunk_size: int,
+    chunk_overlap: int,
+    fingerprint: str = ""
+) -> List[LCDocument]:
+    """
+    Extract and split pages [start, end) of a PDF.
+
+    Args:
+        file_path: Path to the PDF file.
+        start: First page index (0-based, inclusive).
+        end: Last page index (exclusive).
+        chunk_size: Splitter chunk size in characters.
+        chunk_overlap: Splitter chunk overlap in characters.
+        fingerprint: Mixed into each page hash, so changing the chunking or
+            embedding settings makes every page count as changed.
+
+    Returns:
+        Chunks for the range, in page order, with 'page', 'total_pages',
+        'start_index' (character offset within the page), 'chunk_index'
+        (position within the page) and 'page_hash' metadata.
+    """
+    reader = PdfReader(file_path)
+    total_pages = len(reader.pages)
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        add_start_index=True  # lets the context packer strip overlap exactly
+    )
+
+    chunks = []
+    for i in range(start, min(end, total_pages)):
+        text = reader.pages[i].extract_text() or ""
+        page_hash = hashlib.sha256(f"{fingerprint}\n{text}".encode("utf-8")).hexdigest()
+        page = LCDocument(page_content=text, metadata={"page": i, "total_pages": total_pages})
+        for chunk_index, chunk in enumerate(splitter.split_documents([page])):
+            chunk.metadata["chunk_index"] = chunk_index
+            chunk.metadata["page_hash"] = page_hash
+            chunks.append(chunk)
+    return chunks
@@ -1,80 +1,221 @@
-from langchain_qdrant import QdrantVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from qdrant_client import QdrantClient, models
-from typing import List, Optional, Dict, Any
+import asyncio
+from qdrant_client import models
+from typing import List, Optional, Dict, Any, Sequence, Tuple
 
 from app.config import settings
+from app.services.cache import TTLCache, normalize_query
+from app.services.embedding_cache import embedding_cache
+from app.services.embeddings import embedding_provider
+from app.services.singleflight import SingleFlight
+from app.services.telemetry import telemetry
+from app.services.vector_store import qdrant_connection, search_params
+
+DocumentIds = Optional[Tuple[int, ...]]
+
+
+def normalize_document_ids(document_ids: Optional[Sequence[int]]) -> DocumentIds:
+    """Sorted, de-duplicated ids usable as a cache key; None (or empty) means no filter."""
+    if not document_ids:
+        return None
+    return tuple(sorted(set(document_ids)))
+
 
 class RetrievalService:
     """
     Service dedicated to retrieving relevant documents from Qdrant.
     Handles vector search, filtering, and top_k configuration.
+    Searches go through the shared async Qdrant client, so they never block
+    the event loop and reuse warm connections.
     """
     
     def __init__(self):
-        # Initialize Embeddings
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model=settings.embedding_model,
-            google_api_key=settings.gemini_api_key
-        )
+        # Embedding provider selected in Settings, shared with indexing
+        self.embeddings = embedding_provider
         
-        self.qdrant_url = settings.qdrant_url
         self.collection_name = "pdf_rag_collection"
-        self.client = QdrantClient(url=self.qdrant_url)
+        self._collection_ready = False
+        # HNSW ef / quantization rescoring from Settings (None = Qdrant defaults)
+        self.search_params = search_params()
+        
+        # Hot in-process cache in front of the persistent embedding cache
+        self.query_cache = TTLCache(
+            max_entries=settings.query_cache_max_entries,
+            ttl_seconds=settings.query_cache_ttl_seconds
+        )
+        
+        # Identical concurrent embeddings/searches share one in-flight call
+        self.inflight = SingleFlight("retrieval")
+
+    async def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a search query.
+        
+        Looks in the in-process LRU first (keyed by model and normalised query
+        text), then in the shared persistent embedding cache, and only then
+        calls the embedding provider.
+        """
+        key = (self.embeddings.name, normalize_query(query))
+        vector = self.query_cache.get(key)
+        if vector is not None:
+            return vector
+            
+        return await self.inflight.do(("embed",) + key, lambda: self._embed_query(key, query))
+
+    async def _embed_query(self, key: tuple, query: str) -> List[float]:
+        with telemetry.stage("embed_query"):
+            vectors = await embedding_cache.get_or_embed(
+                f"{self.embeddings.name}:query",
+                [query],
+                lambda texts: asyncio.gather(*(self.embeddings.aembed_query(t) for t in texts))
+            )
+        self.query_cache.set(key, vectors[0])
+        return vectors[0]
 
     async def search(
         self, 
         query: str, 
         top_k: int = 4, 
-        doc_filename: Optional[str] = None
+        doc_filename: Optional[str] = None,
+        document_ids: Optional[Sequence[int]] = None
     ) -> List[Dict[str, Any]]:
         """
+        Search for chunks similar to the query.
+        
+        Concurrent calls with the same normalised query, filter and top_k
+        are coalesced into a single search whose result they all share.
+        
         Args:
             query: The user's search query.
             top_k: Number of chunks to retrieve.
-            doc_filename: Optional filename to filter by.
+            doc_filename: Optional stored filename to filter by.
+            document_ids: Optional Document ids; chunks from any of them match.
             
         Returns:
             List of dictionaries containing page_content and metadata.
         """
-        print(f"🔍 Searching for: '{query}' (top_k={top_k}, filter={doc_filename})")
-        
-        # Construct Qdrant Filter if doc_filename is provided
-        qdrant_filter = None
-        if doc_filename and doc_filename != "All Documents":
-            qdrant_filter = models.Filter(
-                must=[
-                    models.FieldCondition(
-                        key="metadata.source",
-                        match=models.MatchValue(value=doc_filename)
-                    )
-                ]
-            )
+        document_ids = normalize_document_ids(document_ids)
+        key = ("search", normalize_query(query), doc_filename, document_ids, top_k)
+        return await self.inflight.do(key, lambda: self._search(query, top_k, doc_filename, document_ids))
 
-        
-        vector_store = QdrantVectorStore.from_existing_collection(
-            embedding=self.embeddings,
-            collection_name=self.collection_name,
-            url=self.qdrant_url
-        )
+    async def _search(
+        self,
+        query: str,
+        top_k: int,
+        doc_filename: Optional[str],
+        document_ids: DocumentIds
+    ) -> List[Dict[str, Any]]:
+        print(f"🔍 Searching for: '{query}' (top_k={top_k}, filter={doc_filename}, documents={document_ids})")
         
         # Perform search
-        # Note: LangChain's similarity_search accepts a filter argument for Qdrant
-        results = vector_store.similarity_search(
-            query, 
-            k=top_k,
-            filter=qdrant_filter
-        )
-        
-        # Format results
+        query_vector = await self.embed_query(query)
+        await self._ensure_collection(len(query_vector))
+        with telemetry.stage("search"):
+            response = await qdrant_connection.client.query_points(
+                collection_name=self.collection_name,
+                query=query_vector,
+                query_filter=self._build_filter(doc_filename, document_ids),
+                search_params=self.search_params,
+                limit=top_k,
+                with_payload=True
+            )
+        return self._format_points(response.points)
+
+    async def _ensure_collection(self, vector_size: int):
+        # Searching before the first upload finds an empty, correctly configured collection
+        if not self._collection_ready:
+            await qdrant_connection.ensure_collection(self.collection_name, vector_size)
+            self._collection_ready = True
+
+    def _build_filter(
+        self,
+        doc_filename: Optional[str],
+        document_ids: DocumentIds = None
+    ) -> Optional[models.Filter]:
+        # Construct Qdrant Filter on the indexed payload fields (see PAYLOAD_INDEXES)
+        conditions = []
+        if doc_filename and doc_filename != "All Documents":
+            conditions.append(models.FieldCondition(
+                key="metadata.source",
+                match=models.MatchValue(value=doc_filename)
+            ))
+        if document_ids:
+            conditions.append(models.FieldCondition(
+                key="metadata.document_id",
+                match=models.MatchAny(any=list(document_ids))
+            ))
+        return models.Filter(must=conditions) if conditions else None
+
+    def _format_points(self, points) -> List[Dict[str, Any]]:
+        # Format results (payload layout written by IndexingService)
         formatted_results = []
-        for doc in results:
+        for point in points:
+            payload = point.payload or {}
             formatted_results.append({
-                "page_content": doc.page_content,
-                "metadata": doc.metadata
+                "page_content": payload.get("page_content", ""),
+                "metadata": payload.get("metadata") or {}
             })
-            
         return formatted_results
 
+    async def embed_queries(self, queries: Sequence[str]) -> List[List[float]]:
+        """
+        Embed many queries at once (for batch jobs).
+        
+        Queries found in the LRU or the persistent cache are reused; the rest
+        are embedded in batched API calls rather than one call per query.
+        """
+        keys = [(self.embeddings.name, normalize_query(q)) for q in queries]
+        vectors: List[Optional[List[float]]] = [self.query_cache.get(key) for key in keys]
+        missing = {}  # normalised key -> original query, embedded once even if repeated
+        for key, query, vector in zip(keys, queries, vectors):
+            if vector is None:
+                missing.setdefault(key, query)
+        
+        if missing:
+            with telemetry.stage("embed_query"):
+                embedded = await embedding_cache.get_or_embed(
+                    f"{self.embeddings.name}:query",
+                    list(missing.values()),
+                    self.embeddings.aembed_queries
+                )
+            for key, vector in zip(missing, embedded):
+                self.query_cache.set(key, vector)
+            by_key = dict(zip(missing, embedded))
+            vectors = [vector if vector is not None else by_key[key] for key, vector in zip(keys, vectors)]
+        return vectors
+
+    async def search_batch(
+        self,
+        query_vectors: Sequence[List[float]],
+        params: Sequence[Tuple[int, Optional[str], DocumentIds]]
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Run many searches in a single Qdrant request.
+        
+        Args:
+            query_vectors: One embedded query per search.
+            params: (top_k, doc_filename, document_ids) per search.
+        
+        Returns:
+            Formatted chunks per search, in input order.
+        """
+        requests = [
+            models.QueryRequest(
+                query=vector,
+                filter=self._build_filter(doc_filename, normalize_document_ids(document_ids)),
+                params=self.search_params,
+                limit=top_k,
+                with_payload=True
+            )
+            for vector, (top_k, doc_filename, document_ids) in zip(query_vectors, params)
+        ]
+        if query_vectors:
+            await self._ensure_collection(len(query_vectors[0]))
+        with telemetry.stage("search"):
+            responses = await qdrant_connection.client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=requests
+            )
+        return [self._format_points(response.points) for response in responses]
+
 # Singleton instance
 retrieval_service = RetrievalService()
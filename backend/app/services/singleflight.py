@@ -0,0 +1,58 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from app.services.telemetry import telemetry
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one in-flight task.
+
+    The first caller for a key starts the work as a task; callers arriving
+    with the same key while it runs await that same task instead of
+    starting their own. Callers are shielded from each other: one caller
+    being cancelled (e.g. a client disconnect) does not cancel the shared
+    work for the others.
+
+    The shared task records its stage timings separately and every caller
+    (the first one and those that joined) adds them to its own request
+    breakdown, so coalesced requests report the stages they waited on.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+        # Stats
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._timed(fn))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        result, timings = await asyncio.shield(task)
+        telemetry.add_timings(timings)
+        return result
+
+    @staticmethod
+    async def _timed(fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, Dict[str, float]]:
+        # The task runs in a copy of the first caller's context: give it its own breakdown
+        with telemetry.request_timings() as timings:
+            return await fn(), timings
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
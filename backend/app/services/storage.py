@@ -0,0 +1,337 @@
+import hashlib
+import os
+import uuid
+import zipfile
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import aiofiles
+import aiofiles.os
+from starlette.requests import Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from app.config import settings
+
+# Uploaded PDFs, stored under their content hash
+UPLOAD_DIR = settings.upload_dir
+
+PDF_MAGIC = b"%PDF-"
+ZIP_MAGIC = b"PK\x03\x04"
+COPY_CHUNK_SIZE = 1024 * 1024
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """The request or one of its files is over the configured size limit."""
+
+
+class InvalidUpload(ValueError):
+    """The request is not a usable multipart upload."""
+
+
+class UnsupportedFileType(InvalidUpload):
+    """A file's first bytes do not match the expected type."""
+
+
+@dataclass
+class SavedUpload:
+    """A file part streamed to a temporary file next to the final upload location."""
+    filename: str
+    temp_path: str
+    file_hash: str
+    size: int
+    magic: bytes = PDF_MAGIC  # which of the accepted signatures the file starts with
+
+
+def stored_filename(filename: str, file_hash: str) -> str:
+    """Name of an upload on disk (and in `metadata.source`): content hash plus original extension."""
+    return f"{file_hash}{os.path.splitext(filename)[1]}"
+
+
+def stored_path(filename: str, file_hash: str) -> str:
+    return os.path.join(UPLOAD_DIR, stored_filename(filename, file_hash))
+
+
+async def discard_uploads(uploads: Sequence[SavedUpload]):
+    for upload in uploads:
+        try:
+            await aiofiles.os.remove(upload.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+class _FilePart:
+    """State of the file part currently being received."""
+
+    def __init__(self, filename: str, magic: Sequence[bytes]):
+        self.filename = filename
+        self.magic = magic
+        self.temp_path = os.path.join(UPLOAD_DIR, f".{uuid.uuid4().hex}.part")
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.head = b""  # held back until the magic bytes can be checked
+        self.matched: Optional[bytes] = None
+        self.file = None
+
+    async def write(self, data: bytes, max_bytes: int):
+        self.size += len(data)
+        if self.size > max_bytes:
+            raise UploadTooLarge(f"{self.filename} is larger than {max_bytes // (1024 * 1024)} MB")
+        if self.file is None:
+            self.head += data
+            needed = max(len(m) for m in self.magic)
+            if len(self.head) < needed:
+                return
+            self._check_magic()
+            data, self.head = self.head, b""
+            self.file = await aiofiles.open(self.temp_path, "wb")
+        self.digest.update(data)
+        await self.file.write(data)
+
+    def _check_magic(self):
+        self.matched = next((m for m in self.magic if self.head.startswith(m)), None)
+        if self.matched is None:
+            raise UnsupportedFileType(
+                f"{self.filename} is not a PDF" if self.magic == (PDF_MAGIC,)
+                else f"{self.filename} is not a PDF or ZIP archive"
+            )
+
+    async def finish(self) -> SavedUpload:
+        if self.file is None:
+            # Shorter than the magic bytes: check (and write) what there is
+            self._check_magic()
+            self.file = await aiofiles.open(self.temp_path, "wb")
+            self.digest.update(self.head)
+            await self.file.write(self.head)
+        await self.file.close()
+        return SavedUpload(self.filename, self.temp_path, self.digest.hexdigest(), self.size, self.matched)
+
+    async def abort(self):
+        if self.file is not None:
+            await self.file.close()
+            try:
+                await aiofiles.os.remove(self.temp_path)
+            except FileNotFoundError:
+                pass
+
+
+async def receive_uploads(
+    request: Request,
+    max_file_bytes: Optional[int] = None,
+    max_request_bytes: Optional[int] = None,
+    magic: Sequence[bytes] = (PDF_MAGIC,),
+    rejected: Optional[List[Tuple[str, str]]] = None
+) -> List[SavedUpload]:
+    """
+    Stream every file part of a multipart request to disk.
+
+    The body is parsed as it arrives (nothing is spooled in memory or in a
+    system temp dir first). Each file is written with aiofiles in chunks
+    and hashed on the way. A request whose Content-Length is already over
+    the limit is rejected before reading it; otherwise reading stops at the
+    first file over `max_file_bytes`, or whose first bytes are not one of
+    `magic`, before anything of it is written. Non-file fields are ignored.
+    If a `rejected` list is given, such files are skipped and recorded in
+    it as (filename, reason) instead, and the rest of the request is read.
+
+    Raises:
+        UploadTooLarge: A file or the whole request is over the limit.
+        InvalidUpload: Not multipart/form-data, or a malformed body.
+        UnsupportedFileType: A file does not start with any of `magic`.
+    """
+    max_file_bytes = max_file_bytes or settings.max_upload_mb * 1024 * 1024
+    max_request_bytes = max_request_bytes or max_file_bytes + MULTIPART_OVERHEAD
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_request_bytes:
+        raise UploadTooLarge(f"Upload is larger than {max_request_bytes // (1024 * 1024)} MB")
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise InvalidUpload("Expected a multipart/form-data upload")
+
+    # The parser's callbacks are synchronous: collect events, then handle them with async I/O
+    events = []
+    headers = {}
+    header = [b"", b""]  # field, value of the header being parsed
+
+    def on_part_begin():
+        headers.clear()
+
+    def on_header_field(data, start, end):
+        header[0] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header[1] += data[start:end]
+
+    def on_header_end():
+        headers[header[0].lower()] = header[1]
+        header[0] = header[1] = b""
+
+    def on_headers_finished():
+        events.append(("headers", dict(headers)))
+
+    def on_part_data(data, start, end):
+        events.append(("data", data[start:end]))
+
+    def on_part_end():
+        events.append(("end", None))
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    saved: List[SavedUpload] = []
+    part: Optional[_FilePart] = None
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_request_bytes:
+                raise UploadTooLarge(f"Upload is larger than {max_request_bytes // (1024 * 1024)} MB")
+            try:
+                parser.write(chunk)
+            except ValueError as e:
+                raise InvalidUpload(f"Malformed multipart body: {e}")
+            for kind, value in events:
+                if kind == "headers":
+                    _, disposition = parse_options_header(value.get(b"content-disposition", b""))
+                    filename = disposition.get(b"filename")
+                    part = _FilePart(os.path.basename(filename.decode("utf-8", "replace")), magic) if filename else None
+                elif kind == "data" and part is not None:
+                    try:
+                        await part.write(value, max_file_bytes)
+                    except (UploadTooLarge, UnsupportedFileType) as e:
+                        if rejected is None:
+                            raise
+                        await part.abort()
+                        rejected.append((part.filename, str(e)))
+                        part = None  # drop the rest of this part
+                elif kind == "end" and part is not None:
+                    try:
+                        saved.append(await part.finish())
+                    except UnsupportedFileType as e:
+                        if rejected is None:
+                            raise
+                        await part.abort()
+                        rejected.append((part.filename, str(e)))
+                    part = None
+            events.clear()
+        parser.finalize()
+        if part is not None:
+            raise InvalidUpload(f"Upload of {part.filename} ended early")
+    except BaseException:
+        if part is not None:
+            await part.abort()
+        await discard_uploads(saved)
+        raise
+    return saved
+
+
+def _copy_pdf(source, filename: str, max_bytes: int) -> SavedUpload:
+    """Copy a readable binary stream to a temporary upload file, hashing it; it must be a PDF."""
+    temp_path = os.path.join(UPLOAD_DIR, f".{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    head = source.read(len(PDF_MAGIC))
+    if not head.startswith(PDF_MAGIC):
+        raise UnsupportedFileType(f"{filename} is not a PDF")
+    try:
+        with open(temp_path, "wb") as target:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"{filename} is larger than {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                target.write(chunk)
+                chunk = source.read(COPY_CHUNK_SIZE)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return SavedUpload(filename, temp_path, digest.hexdigest(), size)
+
+
+def extract_zip_pdfs(
+    zip_path: str,
+    archive_name: str,
+    max_file_bytes: int,
+    max_total_bytes: int,
+    max_files: int,
+    rejected: List[Tuple[str, str]]
+) -> List[SavedUpload]:
+    """
+    Copy the PDFs inside a ZIP archive to temporary upload files (blocking; run it in a thread).
+
+    Members are read as streams, so a member is never held in memory.
+    Sizes are checked while decompressing rather than trusting the
+    archive's headers. Members that are not PDFs, are too large or come
+    after `max_files` are skipped and recorded in `rejected`. An archive
+    whose PDFs decompress to more than `max_total_bytes` in all (a ZIP
+    bomb, or just too much) is rejected as a whole, under `archive_name`.
+    """
+    saved: List[SavedUpload] = []
+    total = 0
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            for info in archive.infolist():
+                name = os.path.basename(info.filename)
+                # Directories, and macOS "._" resource forks next to the real files
+                if info.is_dir() or not name or name.startswith("."):
+                    continue
+                if len(saved) >= max_files:
+                    rejected.append((name, f"More than {max_files} files in one upload"))
+                    continue
+                limit = min(max_file_bytes, max_total_bytes - total)
+                try:
+                    with archive.open(info) as member:
+                        upload = _copy_pdf(member, name, limit)
+                except UnsupportedFileType as e:
+                    rejected.append((name, str(e)))
+                    continue
+                except UploadTooLarge as e:
+                    if limit == max_file_bytes:
+                        rejected.append((name, str(e)))
+                        continue
+                    for upload in saved:
+                        os.remove(upload.temp_path)
+                    saved = []
+                    rejected.append((
+                        archive_name,
+                        f"{archive_name} expands to more than {max_total_bytes // (1024 * 1024)} MB"
+                    ))
+                    break
+                saved.append(upload)
+                total += upload.size
+    except zipfile.BadZipFile as e:
+        rejected.append((archive_name, f"Not a readable ZIP archive: {e}"))
+    except BaseException:
+        for upload in saved:
+            os.remove(upload.temp_path)
+        raise
+    return saved
+
+
+async def save_local_pdf(path: str) -> SavedUpload:
+    """Copy a PDF from the local filesystem into a temporary upload file (used by the CLI)."""
+    async with aiofiles.open(path, "rb") as source:
+        part = _FilePart(os.path.basename(path), (PDF_MAGIC,))
+        try:
+            while chunk := await source.read(COPY_CHUNK_SIZE):
+                await part.write(chunk, max_bytes=float("inf"))
+            return await part.finish()
+        except BaseException:
+            await part.abort()
+            raise
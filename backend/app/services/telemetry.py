@@ -0,0 +1,228 @@
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Seconds; covers cache hits (sub-ms) through slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def labels(**pairs) -> LabelKey:
+    """Label key for CallbackGauge results."""
+    return _label_key(pairs)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. requests in flight."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class CallbackGauge:
+    """Gauge computed at scrape time; the callback returns {label key: value}, see `labels()`."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, callback: Callable[[], Dict[LabelKey, float]]):
+        self.name = name
+        self.help = help
+        self.callback = callback
+
+    def samples(self) -> Iterator[str]:
+        try:
+            values = self.callback()
+        except Exception as e:
+            print(f"❌ Metric callback {self.name} failed: {e}")
+            return
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics), optionally split by labels."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = ("le", _format_value(bound))
+                yield f"{self.name}_bucket{_format_labels(key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(key)} {count}"
+
+
+class Telemetry:
+    """
+    In-process metrics registry exported in the Prometheus text format.
+
+    Services time their stages with `stage()`, which feeds the shared
+    `rag_stage_seconds` histogram. When a request has opened a breakdown
+    with `request_timings()`, the same durations are also summed per stage
+    for that request so they can be stored on its Metric row.
+    """
+
+    def __init__(self):
+        self._metrics: List = []
+        self._timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+            "request_timings", default=None
+        )
+
+        self.stage_seconds = self.register(Histogram(
+            "rag_stage_seconds", "Duration of pipeline stages (chat and indexing)"
+        ))
+        self.ttft_seconds = self.register(Histogram(
+            "rag_llm_time_to_first_token_seconds", "Time from request start to the first streamed token"
+        ))
+        self.llm_tokens = self.register(Counter(
+            "rag_llm_tokens_total", "LLM tokens used, by model and direction"
+        ))
+        self.context_tokens = self.register(Counter(
+            "rag_context_tokens_total", "Estimated prompt context tokens, sent vs saved by packing"
+        ))
+        self.in_flight = self.register(Gauge(
+            "rag_requests_in_flight", "Requests currently being processed, by endpoint"
+        ))
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    @contextmanager
+    def request_timings(self) -> Iterator[Dict[str, float]]:
+        """Collect this request's stage durations (ms) into the yielded dict."""
+        timings: Dict[str, float] = {}
+        token = self._timings.set(timings)
+        try:
+            yield timings
+        finally:
+            self._timings.reset(token)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block as pipeline stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(name, time.perf_counter() - start)
+
+    def add_timings(self, timings: Dict[str, float]):
+        """Add stage durations (ms) measured elsewhere, e.g. in a shared task, to this request's breakdown."""
+        current = self._timings.get()
+        if current is not None:
+            for name, ms in timings.items():
+                current[name] = current.get(name, 0) + ms
+
+    def observe_stage(self, name: str, seconds: float):
+        """Record a stage duration measured by the caller."""
+        self.stage_seconds.observe(seconds, stage=name)
+        timings = self._timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0) + seconds * 1000
+
+    @contextmanager
+    def track_in_flight(self, endpoint: str):
+        self.in_flight.inc(endpoint=endpoint)
+        try:
+            yield
+        finally:
+            self.in_flight.dec(endpoint=endpoint)
+
+    def record_tokens(self, model_name: str, usage: Optional[dict]):
+        """Count tokens from a LangChain `usage_metadata` dict, if the provider returned one."""
+        if not usage:
+            return
+        self.llm_tokens.inc(usage.get("input_tokens", 0), model=model_name, direction="input")
+        self.llm_tokens.inc(usage.get("output_tokens", 0), model=model_name, direction="output")
+        timings = self._timings.get()
+        if timings is not None:
+            timings["input_tokens"] = timings.get("input_tokens", 0) + usage.get("input_tokens", 0)
+            timings["output_tokens"] = timings.get("output_tokens", 0) + usage.get("output_tokens", 0)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+telemetry = Telemetry()
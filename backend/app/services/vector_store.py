@@ -0,0 +1,147 @@
+import asyncio
+from typing import Optional
+from qdrant_client import AsyncQdrantClient, models
+
+from app.config import settings
+
+# Payload fields used in search filters; indexed so filtered search does not scan payloads
+PAYLOAD_INDEXES = {
+    "metadata.document_id": models.PayloadSchemaType.INTEGER,
+    "metadata.page": models.PayloadSchemaType.INTEGER,
+    "metadata.source": models.PayloadSchemaType.KEYWORD,
+}
+
+
+def quantization_config(mode: Optional[str] = None) -> Optional[models.QuantizationConfig]:
+    """Quantization for `qdrant_quantization` ("none", "scalar" or "binary")."""
+    mode = (mode or settings.qdrant_quantization).lower()
+    always_ram = settings.qdrant_quantization_always_ram
+    if mode == "none":
+        return None
+    if mode == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, always_ram=always_ram)
+        )
+    if mode == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=always_ram))
+    raise ValueError(f"Unknown qdrant_quantization: {mode!r} (expected none, scalar or binary)")
+
+
+def hnsw_config() -> models.HnswConfigDiff:
+    return models.HnswConfigDiff(
+        m=settings.qdrant_hnsw_m,
+        ef_construct=settings.qdrant_hnsw_ef_construct,
+        on_disk=settings.qdrant_hnsw_on_disk
+    )
+
+
+def search_params() -> Optional[models.SearchParams]:
+    """Search-time HNSW ef and quantization rescoring, or None to use Qdrant's defaults."""
+    quantization = None
+    if settings.qdrant_quantization.lower() != "none":
+        quantization = models.QuantizationSearchParams(
+            rescore=settings.qdrant_search_rescore,
+            oversampling=settings.qdrant_search_oversampling
+        )
+    hnsw_ef = settings.qdrant_search_ef or None
+    if quantization is None and hnsw_ef is None:
+        return None
+    return models.SearchParams(hnsw_ef=hnsw_ef, quantization=quantization)
+
+
+class QdrantConnection:
+    """
+    Process-wide Qdrant client shared by indexing and retrieval.
+
+    The AsyncQdrantClient is created lazily on first use and reused for every
+    request, so HTTP keep-alive connections (or the gRPC channel when
+    `qdrant_prefer_grpc` is set) stay warm. Setting `qdrant_url` to
+    ":memory:" runs an in-process Qdrant, which benchmarks use.
+    """
+
+    def __init__(self):
+        self._client: Optional[AsyncQdrantClient] = None
+        # Indexing and the first searches may bootstrap at the same time
+        self._bootstrap_lock = asyncio.Lock()
+
+    @property
+    def client(self) -> AsyncQdrantClient:
+        if self._client is None:
+            if settings.qdrant_url == ":memory:":
+                self._client = AsyncQdrantClient(location=":memory:")
+            else:
+                self._client = AsyncQdrantClient(
+                    url=settings.qdrant_url,
+                    prefer_grpc=settings.qdrant_prefer_grpc,
+                    grpc_port=settings.qdrant_grpc_port,
+                    timeout=settings.qdrant_timeout
+                )
+        return self._client
+
+    async def ensure_collection(self, collection_name: str, vector_size: int) -> bool:
+        """
+        Bootstrap the collection from Settings: vector size and distance,
+        on-disk vectors, HNSW parameters, quantization and payload indexes.
+
+        An existing collection gets the configured HNSW, quantization and
+        on-disk options applied as an update (Qdrant rebuilds in the
+        background only if they changed). Its vector size cannot change, so
+        a mismatching `vector_size` raises ValueError.
+
+        Returns:
+            bool: True if the collection was created.
+        """
+        async with self._bootstrap_lock:
+            return await self._ensure_collection(collection_name, vector_size)
+
+    async def _ensure_collection(self, collection_name: str, vector_size: int) -> bool:
+        client = self.client
+        quantization = quantization_config()
+        created = False
+        if not await client.collection_exists(collection_name):
+            await client.create_collection(
+                collection_name=collection_name,
+                vectors_config=models.VectorParams(
+                    size=vector_size,
+                    distance=models.Distance.COSINE,
+                    on_disk=settings.qdrant_vectors_on_disk
+                ),
+                hnsw_config=hnsw_config(),
+                quantization_config=quantization
+            )
+            created = True
+            print(f"✅ Created Qdrant collection {collection_name} "
+                  f"(size={vector_size}, quantization={settings.qdrant_quantization}, "
+                  f"on_disk={settings.qdrant_vectors_on_disk})")
+        else:
+            existing = (await client.get_collection(collection_name)).config.params.vectors
+            if isinstance(existing, models.VectorParams) and existing.size != vector_size:
+                # e.g. the embedding provider was switched: the old vectors are unusable
+                raise ValueError(
+                    f"Qdrant collection {collection_name} holds {existing.size}-d vectors but the "
+                    f"embedding provider returns {vector_size}-d ones; delete the collection and re-index"
+                )
+            await client.update_collection(
+                collection_name=collection_name,
+                vectors_config={"": models.VectorParamsDiff(on_disk=settings.qdrant_vectors_on_disk)},
+                hnsw_config=hnsw_config(),
+                quantization_config=quantization or models.Disabled.DISABLED
+            )
+
+        # Idempotent, so collections created before these indexes existed get them too
+        for field_name, schema in PAYLOAD_INDEXES.items():
+            await client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=schema
+            )
+        return created
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+# Singleton instance
+qdrant_connection = QdrantConnection()
@@ -0,0 +1,237 @@
+"""
+End-to-end API load benchmark.
+
+Runs the real FastAPI app under uvicorn (in a background thread) against
+local stand-ins only: stub embeddings, a stub chat model with configurable
+first-token latency and token rate, in-memory Qdrant and a throwaway
+SQLite database. It then drives the upload, chat, streaming chat and
+listing endpoints at a fixed concurrency and prints one JSON report with
+throughput, p50/p95/p99 latency, time-to-first-token and peak RSS per
+phase, so runs can be diffed to catch regressions.
+
+Usage (from backend/):
+    python -m benchmarks.bench_api --concurrency 16 --chat 200 --stream 100 --output baseline.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+WORKDIR = tempfile.mkdtemp(prefix="rag-bench-")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("QDRANT_URL", ":memory:")
+os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL_OVERRIDE", f"sqlite+aiosqlite:///{WORKDIR}/bench.db")
+os.environ.setdefault("DATABASE_ECHO", "false")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(WORKDIR, "uploads"))
+
+from benchmarks.bench_indexing import percentile
+from benchmarks.stubs import StubChatModel, StubEmbeddings
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+
+def summarize(latencies, errors: int, seconds: float, ttfts=None) -> dict:
+    completed = len(latencies)
+    stats = {
+        "requests": completed + errors,
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(completed / seconds, 2) if seconds else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+    if ttfts is not None:
+        stats.update({
+            "ttft_p50_ms": round(percentile(ttfts, 50), 2),
+            "ttft_p95_ms": round(percentile(ttfts, 95), 2),
+            "ttft_p99_ms": round(percentile(ttfts, 99), 2),
+        })
+    return stats
+
+
+async def drive(count: int, concurrency: int, request) -> dict:
+    """Run `request(i)` for i in range(count), at most `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, ttfts, errors = [], [], 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                ttft = await request(i)
+            except Exception:
+                errors += 1
+                return
+            latencies.append((time.perf_counter() - started) * 1000)
+            if ttft is not None:
+                ttfts.append((ttft - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return summarize(latencies, errors, time.perf_counter() - started, ttfts if ttfts else None)
+
+
+def start_server(port: int):
+    import uvicorn
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("API server failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+async def run(args, base_url: str) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        phases = {}
+
+        # Uploads: distinct documents, then wait for background indexing to drain
+        pdfs = [
+            write_synthetic_pdf(os.path.join(WORKDIR, f"doc{i}.pdf"), args.pages, seed=i)
+            for i in range(args.uploads)
+        ]
+        document_ids = []
+
+        async def upload(i):
+            with open(pdfs[i], "rb") as f:
+                response = await client.post(
+                    "/api/upload", files={"file": (f"doc{i}.pdf", f.read(), "application/pdf")}
+                )
+            response.raise_for_status()
+            document_ids.append(response.json()["id"])
+
+        phases["upload"] = await drive(args.uploads, args.concurrency, upload)
+
+        started = time.perf_counter()
+        pending = set(document_ids)
+        while pending:
+            for document_id in list(pending):
+                response = await client.get(f"/api/documents/{document_id}")
+                if response.json()["status"] != "indexing":
+                    pending.discard(document_id)
+            await asyncio.sleep(0.1)
+        phases["indexing"] = {
+            "documents": args.uploads,
+            "pages": args.uploads * args.pages,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+        # Distinct questions by default so answer/embedding caches do not flatter the numbers
+        def query(i):
+            return f"how do I reset the pump relay, variant {i % args.distinct_queries}"
+
+        session_ids = []
+
+        async def chat(i):
+            response = await client.post("/api/chat", json={"query": query(i), "top_k": args.top_k})
+            response.raise_for_status()
+            session_ids.append(response.json()["session_id"])
+
+        phases["chat"] = await drive(args.chat, args.concurrency, chat)
+
+        async def chat_stream(i):
+            first_token = None
+            payload = {"query": query(args.chat + i), "top_k": args.top_k}
+            async with client.stream("POST", "/api/chat/stream", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line == "event: token" and first_token is None:
+                        first_token = time.perf_counter()
+                    elif line == "event: error":
+                        raise RuntimeError("stream reported an error")
+            return first_token
+
+        phases["chat_stream"] = await drive(args.stream, args.concurrency, chat_stream)
+
+        listings = ["/api/documents", "/api/sessions"] + [
+            f"/api/sessions/{session_id}/messages" for session_id in session_ids[:20]
+        ]
+
+        async def listing(i):
+            response = await client.get(listings[i % len(listings)])
+            response.raise_for_status()
+
+        phases["listing"] = await drive(args.listing, args.concurrency, listing)
+        return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=20, help="Pages per uploaded PDF")
+    parser.add_argument("--chat", type=int, default=200, help="Number of /api/chat requests")
+    parser.add_argument("--stream", type=int, default=100, help="Number of /api/chat/stream requests")
+    parser.add_argument("--listing", type=int, default=500, help="Number of listing requests")
+    parser.add_argument("--distinct-queries", type=int, default=1_000_000, help="Lower to exercise the caches")
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="Stub seconds per embedding call")
+    parser.add_argument("--embed-dim", type=int, default=128)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Stub seconds to first token")
+    parser.add_argument("--llm-tokens", type=int, default=64, help="Stub tokens per answer")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Stub tokens per second")
+    parser.add_argument("--output", default=None, help="Also write the JSON report to this file")
+    parser.add_argument(
+        "--server-log", default=os.devnull,
+        help="File for the app's log lines during the run (default: discarded, to keep them out of the measurement)"
+    )
+    args = parser.parse_args()
+
+    from app.services.indexing_service import indexing_service
+    from app.services.llm_pool import llm_client_pool
+    from app.services.retrieval_service import retrieval_service
+
+    embeddings = StubEmbeddings(dim=args.embed_dim, latency=args.embed_latency)
+    indexing_service.embedder.embeddings = embeddings
+    retrieval_service.embeddings = embeddings
+    llm_client_pool._create = lambda model_name, temperature: StubChatModel(
+        latency=args.llm_latency, tokens=args.llm_tokens, token_rate=args.token_rate
+    )
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    # The services log with print(): send their per-request lines to --server-log
+    with open(args.server_log, "w") as log, contextlib.redirect_stdout(log):
+        server, thread = start_server(port)
+        phases = asyncio.run(run(args, f"http://127.0.0.1:{port}"))
+        server.should_exit = True
+        thread.join()
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "server_log")},
+        "phases": phases,
+        # ru_maxrss is in KiB on Linux; children are the PDF parse workers
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_rss_children_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
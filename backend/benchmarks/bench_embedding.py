@@ -0,0 +1,102 @@
+"""
+Embedding stage benchmark.
+
+Runs the full streaming indexing pipeline against a stub embedder that
+simulates per-call latency and 429 quota errors, and reports wall time,
+the adaptive batch size reached, and how many calls were throttled.
+Compare --concurrency 1 with higher values to see the effect of
+overlapping embedding calls with each other and with Qdrant upserts.
+With --provider hashing or local, the same run uses a real CPU embedding
+backend instead of the stub, to measure local inference throughput.
+
+Usage (from backend/):
+    python -m benchmarks.bench_embedding --pages 200 --concurrency 4 --rate-limit-every 25
+    python -m benchmarks.bench_embedding --pages 200 --provider local --model-path ./models/minilm --threads 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "false")
+os.environ.setdefault("QDRANT_URL", ":memory:")
+
+from benchmarks.stubs import StubEmbeddings
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+
+async def run(args) -> dict:
+    from app.services.embedding_pipeline import AdaptiveBatchEmbedder
+    from app.services.indexing_service import indexing_service, IndexingProgress
+
+    if args.provider == "stub":
+        embeddings = StubEmbeddings(
+            dim=args.dim,
+            latency=args.latency,
+            per_text_latency=args.per_text_latency,
+            rate_limit_every=args.rate_limit_every,
+            max_batch=args.max_batch
+        )
+    else:
+        from app.config import settings
+        from app.services.embeddings import create_embedding_provider
+        settings.embedding_provider = args.provider
+        settings.embedding_model_path = args.model_path
+        settings.embedding_dim = args.dim
+        settings.embedding_local_threads = args.threads
+        embeddings = create_embedding_provider()
+    embedder = AdaptiveBatchEmbedder(embeddings)
+    embedder.max_concurrency = args.concurrency
+    embedder._semaphore = asyncio.Semaphore(args.concurrency)
+    embedder.target_latency = args.target_latency_ms / 1000
+    embedder.backoff_base = args.backoff_base
+    indexing_service.embedder = embedder
+    indexing_service._collection_ready = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = write_synthetic_pdf(os.path.join(tmp, "bench.pdf"), args.pages)
+        progress = IndexingProgress()
+        started = time.perf_counter()
+        await indexing_service.index_file(pdf_path, progress=progress)
+        elapsed = time.perf_counter() - started
+        indexing_service.shutdown()
+        if args.provider != "stub":
+            embeddings.shutdown()
+
+    return {
+        "provider": embeddings.name,
+        "pages": args.pages,
+        "chunks": progress.chunks_upserted,
+        "concurrency": args.concurrency,
+        "seconds": round(elapsed, 2),
+        "chunks_per_sec": round(progress.chunks_upserted / elapsed, 1),
+        "stub_calls": getattr(embeddings, "calls", None),
+        "stub_rate_limited": getattr(embeddings, "rate_limited", None),
+        **{f"embedder_{k}": v for k, v in embedder.stats().items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--provider", choices=["stub", "hashing", "local"], default="stub")
+    parser.add_argument("--model-path", default="", help="local: directory with model.onnx or model.npz")
+    parser.add_argument("--threads", type=int, default=2, help="hashing/local: embedding threads")
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub seconds per call")
+    parser.add_argument("--per-text-latency", type=float, default=0.002, help="Stub seconds per text")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Stub 429 on every Nth call")
+    parser.add_argument("--max-batch", type=int, default=0, help="Stub 429 on calls larger than this")
+    parser.add_argument("--target-latency-ms", type=int, default=300)
+    parser.add_argument("--backoff-base", type=float, default=0.1)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
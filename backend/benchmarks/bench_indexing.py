@@ -0,0 +1,129 @@
+"""
+Indexing parse-stage benchmark.
+
+Parses a synthetic PDF while a probe fires simulated chat requests at the
+event loop, and reports parse throughput (pages/sec) alongside chat
+latency percentiles. Run it once with --mode inline (parsing on the event
+loop thread, the old behaviour) and once with --mode pool to compare.
+
+Usage (from backend/):
+    python -m benchmarks.bench_indexing --pages 1000 --workers 4 --mode pool
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "false")
+os.environ.setdefault("QDRANT_URL", ":memory:")
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def chat_probe(stop: asyncio.Event, latencies: list, interval: float, io_wait: float):
+    """
+    Fire a simulated chat request every `interval` seconds and record its latency.
+
+    Latency is measured from when the request was due, so time spent waiting
+    for a blocked event loop counts against it just as it would for a client.
+    """
+    async def handler(due: float):
+        await asyncio.sleep(io_wait)  # stands in for the Qdrant/Gemini round-trips
+        latencies.append((time.perf_counter() - due) * 1000)
+
+    tasks = []
+    due = time.perf_counter()
+    while True:
+        now = time.perf_counter()
+        # Requests that fell due while the loop was blocked are all sent late
+        while due <= now:
+            tasks.append(asyncio.create_task(handler(due)))
+            due += interval
+        if stop.is_set():
+            break
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+    await asyncio.gather(*tasks)
+
+
+async def parse_inline(file_path: str, chunk_size: int, chunk_overlap: int) -> int:
+    """Old behaviour: synchronous pypdf + splitter inside a coroutine."""
+    from app.services.pdf_parsing import count_pages, parse_page_range
+    num_pages = count_pages(file_path)
+    return len(parse_page_range(file_path, 0, num_pages, chunk_size, chunk_overlap))
+
+
+async def parse_pool(file_path: str) -> int:
+    from app.services.indexing_service import indexing_service
+    return len(await indexing_service.parse_file(file_path))
+
+
+async def run(args) -> dict:
+    from app.config import settings
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = write_synthetic_pdf(os.path.join(tmp, "bench.pdf"), args.pages)
+
+        if args.mode == "pool":
+            from app.services.indexing_service import indexing_service
+            indexing_service.parse_workers = args.workers
+            # Warm the pool so process start-up is not billed to the parse
+            await indexing_service.parse_file(write_synthetic_pdf(os.path.join(tmp, "warm.pdf"), 1))
+
+        latencies = []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(chat_probe(stop, latencies, args.probe_interval, args.probe_io_wait))
+        await asyncio.sleep(0)  # let the probe start before parsing begins
+
+        started = time.perf_counter()
+        if args.mode == "pool":
+            num_chunks = await parse_pool(pdf_path)
+        else:
+            num_chunks = await parse_inline(pdf_path, settings.chunk_size, settings.chunk_overlap)
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        await probe
+
+        if args.mode == "pool":
+            indexing_service.shutdown()
+
+    return {
+        "mode": args.mode,
+        "workers": args.workers if args.mode == "pool" else 0,
+        "pages": args.pages,
+        "chunks": num_chunks,
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(args.pages / elapsed, 1),
+        "chat_requests": len(latencies),
+        "chat_p50_ms": round(statistics.median(latencies), 2) if latencies else 0.0,
+        "chat_p99_ms": round(percentile(latencies, 99), 2),
+        "chat_max_ms": round(max(latencies), 2) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--mode", choices=["inline", "pool"], default="pool")
+    parser.add_argument("--probe-interval", type=float, default=0.02, help="Seconds between simulated chat requests")
+    parser.add_argument("--probe-io-wait", type=float, default=0.005, help="Simulated I/O time per chat request")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Memory-ceiling check for the streaming indexing pipeline.
+
+Indexes a synthetic multi-thousand-page PDF with a stub embedder into an
+in-memory Qdrant collection and reports how much the backend process's
+peak RSS grew. Vectors stored by the in-memory Qdrant are excluded from
+the budget by using a tiny embedding dimension, so the number reflects
+the pipeline's own working set. Exits non-zero if the ceiling is exceeded.
+
+Usage (from backend/):
+    python -m benchmarks.bench_memory --pages 3000 --ceiling-mb 150
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "false")
+os.environ.setdefault("QDRANT_URL", ":memory:")
+
+from benchmarks.stubs import StubEmbeddings
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run(args) -> dict:
+    from app.services.indexing_service import indexing_service, IndexingProgress
+
+    indexing_service.embedder.embeddings = StubEmbeddings(dim=args.dim)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = write_synthetic_pdf(os.path.join(tmp, "large.pdf"), args.pages)
+        file_mb = os.path.getsize(pdf_path) / 1024 / 1024
+
+        # Warm up imports and the parse pool before taking the baseline
+        await indexing_service.index_file(write_synthetic_pdf(os.path.join(tmp, "warm.pdf"), 2))
+        baseline = peak_rss_mb()
+
+        progress = IndexingProgress()
+        started = time.perf_counter()
+        await indexing_service.index_file(pdf_path, progress=progress)
+        elapsed = time.perf_counter() - started
+        indexing_service.shutdown()
+
+    growth = peak_rss_mb() - baseline
+    return {
+        "pages": args.pages,
+        "file_mb": round(file_mb, 1),
+        "chunks": progress.chunks_upserted,
+        "seconds": round(elapsed, 2),
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_growth_mb": round(growth, 1),
+        "ceiling_mb": args.ceiling_mb,
+        "passed": growth <= args.ceiling_mb,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=3000)
+    parser.add_argument("--dim", type=int, default=8, help="Stub embedding dimension")
+    parser.add_argument("--ceiling-mb", type=float, default=150.0)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
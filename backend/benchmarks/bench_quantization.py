@@ -0,0 +1,204 @@
+"""
+Collection layout benchmark: quantization, on-disk vectors and HNSW settings.
+
+For each preset the collection is bootstrapped through the same code the
+services use (QdrantConnection.ensure_collection + search_params, driven
+by Settings), filled with clustered synthetic embeddings and queried. The
+JSON report has, per preset:
+- estimated vector RAM (original + quantized vectors that stay in memory),
+- the Qdrant server's resident memory growth, when it exports /metrics,
+- search latency (p50/p95) and throughput,
+- recall@k against exact brute-force cosine search.
+
+The in-memory Qdrant ignores quantization and HNSW settings, so pass --url
+pointing at a real server for meaningful numbers.
+
+Usage (from backend/):
+    python -m benchmarks.bench_quantization --url http://localhost:6333 --points 50000 --dim 768
+    python -m benchmarks.bench_quantization --url http://localhost:6333 --presets full,scalar --search-ef 128
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Optional
+
+import numpy as np
+
+from benchmarks.bench_indexing import percentile
+
+COLLECTION = "bench_quantization"
+
+PRESETS = {
+    "full": {"qdrant_quantization": "none", "qdrant_vectors_on_disk": False},
+    "full-ondisk": {"qdrant_quantization": "none", "qdrant_vectors_on_disk": True},
+    "scalar": {"qdrant_quantization": "scalar", "qdrant_vectors_on_disk": True, "qdrant_search_rescore": True},
+    "scalar-norescore": {"qdrant_quantization": "scalar", "qdrant_vectors_on_disk": True, "qdrant_search_rescore": False},
+    "binary": {
+        "qdrant_quantization": "binary", "qdrant_vectors_on_disk": True,
+        "qdrant_search_rescore": True, "qdrant_search_oversampling": 2.0,
+    },
+    "binary-norescore": {"qdrant_quantization": "binary", "qdrant_vectors_on_disk": True, "qdrant_search_rescore": False},
+}
+
+
+def clustered_vectors(count: int, dim: int, clusters: int, seed: int, centers=None):
+    """Unit vectors scattered around shared centres, roughly like topic clusters of real chunks."""
+    rng = np.random.default_rng(seed)
+    if centers is None:
+        centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors, centers
+
+
+def vector_ram_mb(points: int, dim: int, quantization: str, on_disk: bool, always_ram: bool) -> float:
+    original = 0 if on_disk else points * dim * 4
+    quantized = {"none": 0, "scalar": points * dim, "binary": points * dim / 8}[quantization]
+    return round((original + (quantized if always_ram else 0)) / 2 ** 20, 1)
+
+
+async def server_rss_bytes(url: Optional[str]) -> Optional[int]:
+    if not url:
+        return None
+    import httpx
+    try:
+        async with httpx.AsyncClient(timeout=10) as client:
+            text = (await client.get(f"{url.rstrip('/')}/metrics")).text
+    except Exception:
+        return None
+    match = re.search(r"^memory_resident_bytes\s+(\d+)", text, re.MULTILINE)
+    return int(match.group(1)) if match else None
+
+
+async def wait_until_optimized(client, timeout: float = 600):
+    from qdrant_client import models
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = await client.get_collection(COLLECTION)
+        if info.status == models.CollectionStatus.GREEN:
+            return
+        await asyncio.sleep(0.5)
+
+
+async def run_preset(name: str, args, data: np.ndarray, queries: np.ndarray, truth: np.ndarray) -> dict:
+    from qdrant_client import models
+    from app.config import settings
+    from app.services.vector_store import qdrant_connection, search_params
+
+    for key, value in PRESETS[name].items():
+        setattr(settings, key, value)
+    settings.qdrant_hnsw_m = args.hnsw_m
+    settings.qdrant_hnsw_ef_construct = args.ef_construct
+    settings.qdrant_search_ef = args.search_ef
+
+    client = qdrant_connection.client
+    if await client.collection_exists(COLLECTION):
+        await client.delete_collection(COLLECTION)
+    rss_before = await server_rss_bytes(args.url)
+
+    started = time.perf_counter()
+    await qdrant_connection.ensure_collection(COLLECTION, args.dim)
+    for offset in range(0, len(data), args.upsert_batch):
+        batch = data[offset:offset + args.upsert_batch]
+        await client.upsert(COLLECTION, points=[
+            models.PointStruct(id=offset + i, vector=vector.tolist(), payload={"metadata": {"page": offset + i}})
+            for i, vector in enumerate(batch)
+        ])
+    await wait_until_optimized(client)
+    build_seconds = time.perf_counter() - started
+    rss_after = await server_rss_bytes(args.url)
+
+    params = search_params()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, found = [], [None] * len(queries)
+
+    async def one(i):
+        async with semaphore:
+            t = time.perf_counter()
+            response = await client.query_points(
+                COLLECTION, query=queries[i].tolist(), limit=args.top_k, search_params=params
+            )
+            latencies.append((time.perf_counter() - t) * 1000)
+            found[i] = {point.id for point in response.points}
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(len(queries))))
+    search_seconds = time.perf_counter() - started
+
+    recall = np.mean([len(found[i] & set(truth[i].tolist())) / args.top_k for i in range(len(queries))])
+    await client.delete_collection(COLLECTION)
+    return {
+        "settings": {key: getattr(settings, key) for key in PRESETS[name]},
+        "vector_ram_mb_estimate": vector_ram_mb(
+            len(data), args.dim, settings.qdrant_quantization,
+            settings.qdrant_vectors_on_disk, settings.qdrant_quantization_always_ram
+        ),
+        "server_rss_delta_mb": (
+            round((rss_after - rss_before) / 2 ** 20, 1) if rss_before is not None and rss_after is not None else None
+        ),
+        "build_seconds": round(build_seconds, 2),
+        "qps": round(len(queries) / search_seconds, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        f"recall@{args.top_k}": round(float(recall), 4),
+    }
+
+
+async def run(args) -> dict:
+    from app.services.vector_store import qdrant_connection
+
+    data, centers = clustered_vectors(args.points, args.dim, args.clusters, seed=0)
+    queries, _ = clustered_vectors(args.queries, args.dim, args.clusters, seed=1, centers=centers)
+    # Exact top-k by cosine (vectors are unit length, so a dot product)
+    scores = queries @ data.T
+    truth = np.argsort(-scores, axis=1)[:, :args.top_k]
+
+    results = {}
+    for name in args.presets.split(","):
+        results[name] = await run_preset(name, args, data, queries, truth)
+    await qdrant_connection.close()
+    return {
+        "qdrant": args.url or ":memory:",
+        "points": args.points,
+        "dim": args.dim,
+        "queries": args.queries,
+        "top_k": args.top_k,
+        "hnsw_m": args.hnsw_m,
+        "ef_construct": args.ef_construct,
+        "search_ef": args.search_ef,
+        "presets": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="Qdrant URL (default: in-memory, which ignores quantization)")
+    parser.add_argument("--presets", default=",".join(PRESETS), help=f"Comma-separated, from: {', '.join(PRESETS)}")
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768, help="Gemini embedding-001 vectors are 768-d")
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--upsert-batch", type=int, default=1000)
+    parser.add_argument("--hnsw-m", type=int, default=16)
+    parser.add_argument("--ef-construct", type=int, default=100)
+    parser.add_argument("--search-ef", type=int, default=0, help="0 = Qdrant default")
+    args = parser.parse_args()
+
+    unknown = set(args.presets.split(",")) - set(PRESETS)
+    if unknown:
+        parser.error(f"unknown presets: {', '.join(sorted(unknown))}")
+
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "false")
+    os.environ["QDRANT_URL"] = args.url or ":memory:"
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Retrieval throughput benchmark: per-query vector store vs shared async client.
+
+"before" reproduces the old RetrievalService.search: build a LangChain
+QdrantVectorStore per query (re-validating the collection) and run the
+synchronous similarity_search, which embeds the query on the event loop
+thread. "after" is the current RetrievalService.search on the shared
+AsyncQdrantClient. Both use a stub embedder with the same latency.
+
+By default Qdrant runs in-memory; pass --url to benchmark a real server.
+
+Usage (from backend/):
+    python -m benchmarks.bench_retrieval --points 5000 --queries 400 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+import uuid
+
+from benchmarks.bench_indexing import percentile
+from benchmarks.stubs import StubEmbeddings
+
+COLLECTION = "bench_retrieval"
+
+
+async def drive(handler, queries, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(query):
+        async with semaphore:
+            started = time.perf_counter()
+            await handler(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in queries))
+    elapsed = time.perf_counter() - started
+    return {
+        "seconds": round(elapsed, 3),
+        "qps": round(len(queries) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def seed_points(stub: StubEmbeddings, count: int):
+    from qdrant_client import models
+    rng = random.Random(0)
+    words = "pump valve pressure sensor torque seal filter motor relay fuse".split()
+    points = []
+    for i in range(count):
+        text = " ".join(rng.choice(words) for _ in range(30))
+        points.append(models.PointStruct(
+            id=uuid.uuid4().hex,
+            vector=stub._vector(text),
+            payload={"page_content": text, "metadata": {"source": "bench.pdf", "page": i % 100}}
+        ))
+    return points
+
+
+async def run(args) -> dict:
+    from langchain_qdrant import QdrantVectorStore
+    from qdrant_client import QdrantClient, models
+    from app.services.retrieval_service import retrieval_service
+    from app.services.vector_store import qdrant_connection
+
+    stub = StubEmbeddings(dim=args.dim, latency=args.embed_latency)
+    points = seed_points(stub, args.points)
+    vectors_config = models.VectorParams(size=args.dim, distance=models.Distance.COSINE)
+
+    # "after": shared async client
+    async_client = qdrant_connection.client
+    if await async_client.collection_exists(COLLECTION):
+        await async_client.delete_collection(COLLECTION)
+    await async_client.create_collection(COLLECTION, vectors_config=vectors_config)
+    await async_client.upsert(COLLECTION, points=points)
+    retrieval_service.embeddings = stub
+    retrieval_service.collection_name = COLLECTION
+
+    # "before": a separate sync client (in-memory stores are not shared between clients)
+    if args.url:
+        sync_client = None
+    else:
+        sync_client = QdrantClient(":memory:")
+        sync_client.create_collection(COLLECTION, vectors_config=vectors_config)
+        sync_client.upsert(COLLECTION, points=points)
+
+    async def before(query):
+        if args.url:
+            vector_store = QdrantVectorStore.from_existing_collection(
+                embedding=stub, collection_name=COLLECTION, url=args.url
+            )
+        else:
+            vector_store = QdrantVectorStore(client=sync_client, collection_name=COLLECTION, embedding=stub)
+        vector_store.similarity_search(query, k=args.top_k)
+
+    async def after(query):
+        await retrieval_service.search(query, top_k=args.top_k)
+
+    rng = random.Random(1)
+    queries = [f"how do I reset the {rng.choice(['pump', 'valve', 'relay'])} {i}" for i in range(args.queries)]
+
+    # Keep the per-query log line out of the measurement
+    import builtins
+    real_print, builtins.print = builtins.print, lambda *a, **k: None
+    try:
+        before_stats = await drive(before, queries, args.concurrency)
+        after_stats = await drive(after, queries, args.concurrency)
+    finally:
+        builtins.print = real_print
+
+    await async_client.delete_collection(COLLECTION)
+    await qdrant_connection.close()
+    return {
+        "qdrant": args.url or ":memory:",
+        "points": args.points,
+        "queries": args.queries,
+        "concurrency": args.concurrency,
+        "embed_latency_ms": args.embed_latency * 1000,
+        "before": before_stats,
+        "after": after_stats,
+        "speedup": round(after_stats["qps"] / before_stats["qps"], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="Qdrant URL (default: in-memory)")
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="Stub seconds per query embedding")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "false")
+    os.environ["QDRANT_URL"] = args.url or ":memory:"
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
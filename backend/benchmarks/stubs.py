@@ -0,0 +1,137 @@
+"""
+Local stand-ins for external services used by the benchmarks.
+
+StubEmbeddings implements the embedding provider methods the services
+call, returning deterministic hash-derived vectors without any network.
+It can simulate per-call latency that scales with batch size, and quota
+errors shaped like the ones the Gemini API returns.
+
+StubChatModel stands in for the pooled chat clients: a fixed delay before
+the first token, then tokens at a fixed rate, with usage metadata.
+"""
+
+import asyncio
+import hashlib
+import math
+import time
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+
+class StubRateLimitError(Exception):
+    """Mimics the API's quota error: carries a 429 code and RESOURCE_EXHAUSTED text."""
+    code = 429
+
+
+class StubEmbeddings(Embeddings):
+    """
+    Deterministic embedder with optional simulated latency and 429s.
+
+    Args:
+        dim: Vector dimension.
+        latency: Fixed seconds per call.
+        per_text_latency: Extra seconds per text in the call.
+        rate_limit_every: Fail every Nth call with a 429 (0 disables).
+        max_batch: Fail calls larger than this with a 429 (0 disables), like a
+            per-request quota on payload size.
+    """
+
+    def __init__(
+        self,
+        dim: int = 64,
+        latency: float = 0.0,
+        per_text_latency: float = 0.0,
+        rate_limit_every: int = 0,
+        max_batch: int = 0
+    ):
+        self.name = f"stub-{dim}"
+        self.dim = dim
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.rate_limit_every = rate_limit_every
+        self.max_batch = max_batch
+        self.calls = 0
+        self.rate_limited = 0
+        self.texts_embedded = 0
+
+    def _vector(self, text: str) -> List[float]:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        raw = [digest[i % len(digest)] / 255.0 - 0.5 for i in range(self.dim)]
+        norm = math.sqrt(sum(v * v for v in raw)) or 1.0
+        return [v / norm for v in raw]
+
+    def _call(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        over_batch = self.max_batch and len(texts) > self.max_batch
+        if over_batch or (self.rate_limit_every and self.calls % self.rate_limit_every == 0):
+            self.rate_limited += 1
+            raise StubRateLimitError("429 RESOURCE_EXHAUSTED: Quota exceeded for embed_content requests")
+        self.texts_embedded += len(texts)
+        return [self._vector(t) for t in texts]
+
+    def _delay(self, texts: List[str]) -> float:
+        return self.latency + self.per_text_latency * len(texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Blocking, like the sync client methods: the latency holds the calling thread
+        time.sleep(self._delay(texts))
+        return self._call(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self._delay(texts))
+        return self._call(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        return await self.aembed_documents(texts)
+
+
+class StubChatModel:
+    """
+    Chat model with the ainvoke/astream surface LLMService uses.
+
+    Args:
+        latency: Seconds before the first token.
+        tokens: Number of tokens in every answer.
+        token_rate: Tokens generated per second after the first one.
+    """
+
+    def __init__(self, latency: float = 0.3, tokens: int = 64, token_rate: float = 200.0):
+        self.latency = latency
+        self.tokens = tokens
+        self.token_rate = token_rate
+        self.calls = 0
+
+    def _usage(self, messages) -> dict:
+        prompt = " ".join(str(m[1]) if isinstance(m, tuple) else str(m) for m in messages)
+        input_tokens = len(prompt.split())
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": self.tokens,
+            "total_tokens": input_tokens + self.tokens,
+        }
+
+    def _token(self, i: int) -> str:
+        return f"tok{i} "
+
+    async def ainvoke(self, messages) -> AIMessage:
+        self.calls += 1
+        await asyncio.sleep(self.latency + max(self.tokens - 1, 0) / self.token_rate)
+        text = "".join(self._token(i) for i in range(self.tokens))
+        return AIMessage(content=text, usage_metadata=self._usage(messages))
+
+    async def astream(self, messages):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        for i in range(self.tokens):
+            if i:
+                await asyncio.sleep(1 / self.token_rate)
+            usage = self._usage(messages) if i == self.tokens - 1 else None
+            yield AIMessageChunk(content=self._token(i), usage_metadata=usage)
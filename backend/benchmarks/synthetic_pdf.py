@@ -0,0 +1,71 @@
+"""
+Minimal synthetic PDF writer for benchmarks.
+
+Writes an uncompressed PDF with one text stream per page, so large page
+counts can be generated without any PDF-authoring dependency.
+"""
+
+import random
+
+
+WORDS = (
+    "pump valve pressure manual install check sensor torque bolt seal flow "
+    "filter motor cable panel fault reset switch relay fuse module voltage"
+).split()
+
+
+def _page_text(page_no: int, lines: int, rng: random.Random) -> bytes:
+    ops = [b"BT /F1 10 Tf 12 TL 50 780 Td"]
+    for line_no in range(lines):
+        words = " ".join(rng.choice(WORDS) for _ in range(12))
+        text = f"Page {page_no + 1} line {line_no + 1}: {words}."
+        ops.append(f"({text}) Tj T*".encode("latin-1"))
+    ops.append(b"ET")
+    return b"\n".join(ops)
+
+
+def write_synthetic_pdf(path: str, num_pages: int, lines_per_page: int = 40, seed: int = 0) -> str:
+    """
+    Write a text-only PDF with `num_pages` pages of pseudo-random sentences.
+
+    Returns:
+        The path written.
+    """
+    rng = random.Random(seed)
+    # Object layout: 1 catalog, 2 pages tree, 3 font, then (page, content) pairs
+    first_page_obj = 4
+    page_ids = [first_page_obj + 2 * i for i in range(num_pages)]
+
+    offsets = []
+    with open(path, "wb") as f:
+        def write_obj(obj_id: int, body: bytes):
+            offsets.append((obj_id, f.tell()))
+            f.write(f"{obj_id} 0 obj\n".encode() + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        write_obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = " ".join(f"{pid} 0 R" for pid in page_ids).encode()
+        write_obj(2, b"<< /Type /Pages /Kids [" + kids + b"] /Count " + str(num_pages).encode() + b" >>")
+        write_obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+        for i, page_id in enumerate(page_ids):
+            content_id = page_id + 1
+            write_obj(
+                page_id,
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>".encode()
+            )
+            stream = _page_text(i, lines_per_page, rng)
+            write_obj(
+                content_id,
+                f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream"
+            )
+
+        xref_offset = f.tell()
+        total = len(offsets) + 1
+        f.write(f"xref\n0 {total}\n".encode())
+        f.write(b"0000000000 65535 f \n")
+        for _, offset in sorted(offsets):
+            f.write(f"{offset:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {total} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+    return path
@@ -0,0 +1,23 @@
+"""
+Test setup shared by the backend tests.
+
+Puts backend/ on sys.path, so `pytest` works from the repository root as
+well as from backend/, and points the settings at throwaway local
+services (in-memory Qdrant, SQLite, hashing embeddings) before any app
+module is imported.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORKDIR = tempfile.mkdtemp(prefix="rag-tests-")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("QDRANT_URL", ":memory:")
+os.environ.setdefault("EMBEDDING_PROVIDER", "hashing")
+os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL_OVERRIDE", f"sqlite+aiosqlite:///{WORKDIR}/test.db")
+os.environ.setdefault("DATABASE_ECHO", "false")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(WORKDIR, "uploads"))
@@ -0,0 +1,45 @@
+import asyncio
+import os
+
+from sqlalchemy import func, select
+
+from app.db.init_db import init_database
+from app.db.session import AsyncSessionLocal
+from app.models.models import Document
+from app.services.job_service import IndexingJobQueue
+from app.services.storage import stored_path
+
+
+def test_recover_more_documents_than_queue_size():
+    async def run():
+        os.makedirs(os.environ["UPLOAD_DIR"], exist_ok=True)
+        await init_database()
+        async with AsyncSessionLocal() as db:
+            for i in range(5):
+                file_hash = f"{i:064x}"
+                with open(stored_path("doc.pdf", file_hash), "wb") as f:
+                    f.write(b"%PDF-1.4\n")
+                db.add(Document(filename="doc.pdf", file_hash=file_hash, status="indexing", checkpoint_page=3))
+            await db.commit()
+
+        # A queue that holds two jobs and has no workers draining it
+        queue = IndexingJobQueue()
+        queue.num_workers = 0
+        queue.max_queued = 2
+        await queue.start()
+        try:
+            await queue.recover()
+            await asyncio.sleep(0)  # let the feeder fill the queue
+
+            async with AsyncSessionLocal() as db:
+                ids = (await db.execute(select(Document.id))).scalars().all()
+                still_indexing = await db.scalar(
+                    select(func.count()).select_from(Document).where(Document.status == "indexing")
+                )
+            assert still_indexing == 5  # nothing was discarded
+            assert queue.status_counts() == {"queued": 5, "running": 0, "done": 0, "error": 0}
+            assert all(queue.get_job_for_document(i).status == "queued" for i in ids)
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
@@ -1,5 +1,6 @@
 import streamlit as st
 import requests
+import json
 import os
 
 # Configuration
@@ -20,16 +21,46 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "sessions" not in st.session_state:
     st.session_state.sessions = []
+if "messages_cursor" not in st.session_state:
+    st.session_state.messages_cursor = None
+# Older pages loaded with the "more" buttons: {list name: (items, next_cursor)}
+if "older_pages" not in st.session_state:
+    st.session_state.older_pages = {}
 
 # --- API Helper Functions ---
-def get_sessions():
+PAGE_SIZE = 50
+
+def get_page(path, cursor=None, limit=PAGE_SIZE):
+    """Fetch one page of a paginated list endpoint. Returns (items, next_cursor)."""
+    params = {"limit": limit}
+    if cursor:
+        params["cursor"] = cursor
     try:
-        response = requests.get(f"{API_BASE}/sessions")
+        response = requests.get(f"{API_BASE}{path}", params=params)
         if response.status_code == 200:
-            return response.json()
+            page = response.json()
+            return page["items"], page["next_cursor"]
     except Exception as e:
-        st.error(f"Failed to fetch sessions: {e}")
-    return []
+        st.error(f"Failed to fetch {path}: {e}")
+    return [], None
+
+def get_list_with_older(name, path):
+    """First page of a list plus any older pages already loaded with load_older()."""
+    items, cursor = get_page(path)
+    older, older_cursor = st.session_state.older_pages.get(name, ([], None))
+    if older:
+        seen = {item["id"] for item in items}
+        items = items + [item for item in older if item["id"] not in seen]
+        cursor = older_cursor
+    return items, cursor
+
+def load_older(name, path, cursor):
+    older, _ = st.session_state.older_pages.get(name, ([], None))
+    items, next_cursor = get_page(path, cursor)
+    st.session_state.older_pages[name] = (older + items, next_cursor)
+
+def get_sessions():
+    return get_list_with_older("sessions", "/sessions")
 
 def create_session():
     try:
@@ -40,20 +71,15 @@ def create_session():
         st.error(f"Failed to create session: {e}")
     return None
 
-def get_messages(session_id):
-    try:
-        response = requests.get(f"{API_BASE}/sessions/{session_id}/messages")
-        if response.status_code == 200:
-            return response.json()
-    except Exception as e:
-        st.error(f"Failed to fetch messages: {e}")
-    return []
+def get_messages(session_id, cursor=None):
+    """Latest messages of a session (or the page before `cursor`). Returns (messages, next_cursor)."""
+    return get_page(f"/sessions/{session_id}/messages", cursor)
 
 def upload_file(file):
     files = {"file": (file.name, file, file.type)}
     try:
         response = requests.post(f"{API_BASE}/upload", files=files)
-        if response.status_code == 200:
+        if response.ok:
             return response.json()
         else:
             st.error(f"Upload failed: {response.text}")
@@ -61,32 +87,45 @@ def upload_file(file):
         st.error(f"Upload error: {e}")
     return None
 
-def send_chat_message(query, session_id, model_name, top_k, doc_filter):
+def upload_files(files):
+    """Send several PDFs and/or ZIP archives to the bulk upload endpoint."""
+    parts = [("files", (file.name, file, file.type)) for file in files]
+    try:
+        response = requests.post(f"{API_BASE}/upload/bulk", files=parts)
+        if response.ok:
+            return response.json()
+        else:
+            st.error(f"Upload failed: {response.text}")
+    except Exception as e:
+        st.error(f"Upload error: {e}")
+    return None
+
+def stream_chat_message(query, session_id, model_name, top_k, document_ids):
+    """Yield (event, data) pairs from the SSE chat endpoint."""
     payload = {
         "query": query, 
         "session_id": session_id,
         "model_name": model_name,
         "top_k": top_k,
-        "doc_filter": doc_filter
+        "document_ids": document_ids
     }
     try:
-        response = requests.post(f"{API_BASE}/chat", json=payload)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Chat failed: {response.text}")
+        with requests.post(f"{API_BASE}/chat/stream", json=payload, stream=True) as response:
+            if response.status_code != 200:
+                st.error(f"Chat failed: {response.text}")
+                return
+            event = "message"
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    yield event, json.loads(line[len("data:"):].strip())
+                    event = "message"
     except Exception as e:
         st.error(f"Chat error: {e}")
-    return None
 
 def list_documents():
-    try:
-        response = requests.get(f"{API_BASE}/documents")
-        if response.status_code == 200:
-            return response.json()
-    except Exception:
-        pass
-    return []
+    return get_list_with_older("documents", "/documents")
 
 # --- Sidebar ---
 with st.sidebar:
@@ -94,28 +133,37 @@ with st.sidebar:
     
     # 1. Document Upload
     st.subheader("Upload PDF")
-    uploaded_file = st.file_uploader("Choose a PDF file", type="pdf")
-    if uploaded_file is not None:
+    uploaded_files = st.file_uploader("Choose PDF files or ZIP archives", type=["pdf", "zip"], accept_multiple_files=True)
+    if uploaded_files:
         if st.button("Upload & Index"):
-            with st.spinner("Uploading and indexing..."):
-                result = upload_file(uploaded_file)
-                if result:
-                    st.success(f"Indexed: {result['filename']}")
-                    st.rerun()
+            with st.spinner("Uploading..."):
+                if len(uploaded_files) == 1 and uploaded_files[0].name.lower().endswith(".pdf"):
+                    result = upload_file(uploaded_files[0])
+                    if result:
+                        st.success(f"Uploaded: {result['filename']} (indexing in background)")
+                        st.rerun()
+                else:
+                    result = upload_files(uploaded_files)
+                    if result:
+                        progress = result["progress"]
+                        queued = progress["files"] - progress["duplicates"] - progress["rejected"]
+                        st.success(f"Uploaded {queued} new files ({progress['duplicates']} duplicates, indexing in background)")
+                        for item in result["items"]:
+                            if item["error"]:
+                                st.warning(f"{item['filename']}: {item['error']}")
 
     # 2. Document List
     st.subheader("Indexed Documents")
-    docs = list_documents()
-    doc_map = {"All Documents": "All Documents"}
+    docs, docs_cursor = list_documents()
+    doc_map = {}  # label -> document id
     if docs:
         for doc in docs:
-            status_icon = "✅" if doc['status'] == 'indexed' else "⏳"
+            status_icon = {"indexed": "✅", "error": "❌"}.get(doc['status'], "⏳")
             st.text(f"{status_icon} {doc['filename']}")
-
-            
-            file_ext = os.path.splitext(doc['filename'])[1]
-            stored_filename = f"{doc['file_hash']}{file_ext}"
-            doc_map[doc['filename']] = stored_filename
+            doc_map[f"{doc['filename']} (#{doc['id']})"] = doc['id']
+        if docs_cursor and st.button("More documents"):
+            load_older("documents", "/documents", docs_cursor)
+            st.rerun()
     else:
         st.info("No documents indexed yet.")
 
@@ -130,8 +178,10 @@ with st.sidebar:
         )
         top_k = st.slider("Top K (Chunks)", min_value=1, max_value=10, value=4)
         
-        selected_doc_name = st.selectbox("Filter by Document", list(doc_map.keys()))
-        doc_filter = doc_map[selected_doc_name]
+        selected_docs = st.multiselect(
+            "Filter by Documents", list(doc_map.keys()), placeholder="All Documents"
+        )
+        document_ids = [doc_map[name] for name in selected_docs] or None
 
     st.divider()
     
@@ -142,15 +192,19 @@ with st.sidebar:
         if new_sess:
             st.session_state.session_id = new_sess['id']
             st.session_state.messages = []
+            st.session_state.messages_cursor = None
             st.rerun()
 
-    sessions = get_sessions()
+    sessions, sessions_cursor = get_sessions()
     if sessions:
         for sess in sessions:
             if st.button(f"💬 {sess['title']}", key=sess['id']):
                 st.session_state.session_id = sess['id']
-                st.session_state.messages = get_messages(sess['id'])
+                st.session_state.messages, st.session_state.messages_cursor = get_messages(sess['id'])
                 st.rerun()
+        if sessions_cursor and st.button("Older chats"):
+            load_older("sessions", "/sessions", sessions_cursor)
+            st.rerun()
 
 # --- Main Chat Interface ---
 st.header("Chat with your PDFs")
@@ -159,6 +213,12 @@ if not st.session_state.session_id:
     st.info("Please create a new chat or select an existing session from the sidebar.")
 else:
     # Display Chat History
+    if st.session_state.messages_cursor and st.button("Load earlier messages"):
+        older, st.session_state.messages_cursor = get_messages(
+            st.session_state.session_id, st.session_state.messages_cursor
+        )
+        st.session_state.messages = older + st.session_state.messages
+        st.rerun()
     for msg in st.session_state.messages:
         with st.chat_message(msg['role']):
             st.markdown(msg['content'])
@@ -173,28 +233,37 @@ else:
         
         st.session_state.messages.append({"role": "user", "content": prompt})
 
-        # 2. Get AI Response
+        # 2. Stream AI Response
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response_data = send_chat_message(
-                    prompt, 
-                    st.session_state.session_id,
-                    model_name,
-                    top_k,
-                    doc_filter
-                )
-                
-                if response_data:
-                    answer = response_data['response']
-                    st.markdown(answer)
-                    
-                    # Display Collapsible Context
-                    context = response_data.get('context')
-                    if context:
-                        with st.expander("📄 View Source Context"):
-                            for i, chunk in enumerate(context):
-                                st.markdown(f"**Chunk {i+1}** (Page {chunk['metadata'].get('page', 'N/A')})")
-                                st.text(chunk['page_content'])
-                                st.divider()
+            answer_placeholder = st.empty()
+            answer_placeholder.markdown("▌")
+            answer = ""
+            context = None
+            
+            for event, data in stream_chat_message(
+                prompt, 
+                st.session_state.session_id,
+                model_name,
+                top_k,
+                document_ids
+            ):
+                if event == "context":
+                    context = data.get("context")
+                elif event == "token":
+                    answer += data["text"]
+                    answer_placeholder.markdown(answer + "▌")
+                elif event == "error":
+                    st.error(data.get("detail", "Chat failed"))
                     
-                    st.session_state.messages.append({"role": "assistant", "content": answer})
+            answer_placeholder.markdown(answer)
+            
+            # Display Collapsible Context
+            if context:
+                with st.expander("📄 View Source Context"):
+                    for i, chunk in enumerate(context):
+                        st.markdown(f"**Chunk {i+1}** (Page {chunk['metadata'].get('page', 'N/A')})")
+                        st.text(chunk['page_content'])
+                        st.divider()
+            
+            if answer:
+                st.session_state.messages.append({"role": "assistant", "content": answer})